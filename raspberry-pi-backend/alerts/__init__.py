@@ -4,5 +4,5 @@ Alerts package for fall detection system
 
 # Lazy imports to avoid circular dependencies
 # Import these directly from alerts.alert_engine when needed
-__all__ = ['AlertEngine', 'AlertType', 'AlertSeverity', 'AlertManager']
+__all__ = ('Alert', 'AlertEngine', 'AlertType', 'AlertSeverity', 'AlertManager')
 
@@ -0,0 +1,159 @@
+"""
+Numeric kernels for the alert engine
+Compiled with Numba when it is installed, plain Python otherwise
+"""
+
+import math
+from typing import NamedTuple
+import numpy as np
+
+# Numba is optional - the kernels run unchanged without it
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """Fallback for numba.njit that returns the function unchanged"""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# Band codes for a temperature or humidity value, ordered from low to high
+BAND_CRITICAL_LOW = 0
+BAND_WARNING_LOW = 1
+BAND_BELOW_NORMAL = 2
+BAND_NORMAL = 3
+BAND_ABOVE_NORMAL = 4
+BAND_WARNING_HIGH = 5
+BAND_CRITICAL_HIGH = 6
+
+@njit(cache=True)
+def classify_band(value, critical_min, warning_min, normal_min, normal_max, warning_max, critical_max):
+    """Return the band code for a value (critical/warning limits are inclusive, normal limits are not)"""
+    if value <= critical_min:
+        return BAND_CRITICAL_LOW
+    if value >= critical_max:
+        return BAND_CRITICAL_HIGH
+    if value <= warning_min:
+        return BAND_WARNING_LOW
+    if value >= warning_max:
+        return BAND_WARNING_HIGH
+    if value < normal_min:
+        return BAND_BELOW_NORMAL
+    if value > normal_max:
+        return BAND_ABOVE_NORMAL
+    return BAND_NORMAL
+
+@njit(cache=True)
+def classify_dht22(
+    temperature, humidity, fire_risk_threshold,
+    temp_critical_min, temp_warning_min, temp_normal_min,
+    temp_normal_max, temp_warning_max, temp_critical_max,
+    humidity_critical_min, humidity_warning_min, humidity_normal_min,
+    humidity_normal_max, humidity_warning_max, humidity_critical_max
+):
+    """
+    Classify a DHT22 reading in a single call
+
+    Returns:
+        Tuple of (temperature band, humidity band, fire risk flag)
+    """
+    temp_band = classify_band(
+        temperature, temp_critical_min, temp_warning_min, temp_normal_min,
+        temp_normal_max, temp_warning_max, temp_critical_max
+    )
+    humidity_band = classify_band(
+        humidity, humidity_critical_min, humidity_warning_min, humidity_normal_min,
+        humidity_normal_max, humidity_warning_max, humidity_critical_max
+    )
+    return temp_band, humidity_band, temperature >= fire_risk_threshold
+
+def classify_bands(values, critical_min, warning_min, normal_min, normal_max, warning_max, critical_max):
+    """Vectorized classify_band over a NumPy array, returning an int8 band code per value"""
+    bands = np.full(values.shape, BAND_NORMAL, np.int8)
+    # Assigned from lowest to highest precedence so each value ends with the same code as classify_band
+    bands[values < normal_min] = BAND_BELOW_NORMAL
+    bands[values > normal_max] = BAND_ABOVE_NORMAL
+    bands[values <= warning_min] = BAND_WARNING_LOW
+    bands[values >= warning_max] = BAND_WARNING_HIGH
+    bands[values <= critical_min] = BAND_CRITICAL_LOW
+    bands[values >= critical_max] = BAND_CRITICAL_HIGH
+    return bands
+
+class HistoryStats(NamedTuple):
+    """Extrema of a device's buffered DHT22 readings over the history and trend windows"""
+    history_count: int
+    history_temp_max: float
+    history_humidity_max: float
+    trend_count: int
+    trend_temp_min: float
+    trend_temp_max: float
+    trend_humidity_min: float
+    trend_humidity_max: float
+
+@njit(cache=True)
+def scan_history(temps, humidities, timestamps, n, history_since, trend_since):
+    """
+    Collect history and trend window extrema in a single pass over a ring buffer
+
+    Returns:
+        Tuple in HistoryStats field order
+    """
+    history_count = 0
+    history_temp_max = -math.inf
+    history_humidity_max = -math.inf
+    trend_count = 0
+    trend_temp_min = math.inf
+    trend_temp_max = -math.inf
+    trend_humidity_min = math.inf
+    trend_humidity_max = -math.inf
+    for i in range(n):
+        ts = timestamps[i]
+        if ts < history_since and ts < trend_since:
+            continue
+        temp = temps[i]
+        humidity = humidities[i]
+        if ts >= history_since:
+            history_count += 1
+            if temp > history_temp_max:
+                history_temp_max = temp
+            if humidity > history_humidity_max:
+                history_humidity_max = humidity
+        if ts >= trend_since:
+            trend_count += 1
+            if temp < trend_temp_min:
+                trend_temp_min = temp
+            if temp > trend_temp_max:
+                trend_temp_max = temp
+            if humidity < trend_humidity_min:
+                trend_humidity_min = humidity
+            if humidity > trend_humidity_max:
+                trend_humidity_max = humidity
+    return (
+        history_count, history_temp_max, history_humidity_max,
+        trend_count, trend_temp_min, trend_temp_max, trend_humidity_min, trend_humidity_max
+    )
+
+@njit(cache=True)
+def recent_motion(motion, timestamps, head, n, since, limit):
+    """
+    Walk a PIR ring buffer from newest to oldest, stopping after `limit` readings at or after `since`
+
+    Returns:
+        Tuple of (readings counted, readings with motion)
+    """
+    capacity = motion.shape[0]
+    count = 0
+    motion_count = 0
+    i = head
+    for _ in range(n):
+        i = i - 1 if i > 0 else capacity - 1
+        if timestamps[i] < since:
+            continue
+        count += 1
+        motion_count += motion[i]
+        if count == limit:
+            break
+    return count, motion_count
@@ -3,19 +3,21 @@ Alert Evaluation Engine
 Analyzes sensor data and triggers alerts based on thresholds and ML logic
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from enum import Enum
 import json
 import os
+import threading
+from alerts.ring_buffer import RecentRingBuffer
+import numpy as np
+from alerts._fast import (
+    classify_dht22, classify_bands, scan_history, recent_motion, HistoryStats, BAND_NORMAL
+)
 
-# Import ML predictor (optional - will work without ML models)
-try:
-    from ml_models.ml_alert_predictor import MLAlertPredictor
-    ML_AVAILABLE = True
-except ImportError:
-    ML_AVAILABLE = False
-    MLAlertPredictor = None
+# Shared default for readings without a data payload (never mutated)
+_EMPTY: Dict[str, Any] = {}
 
 class AlertSeverity(str, Enum):
     """Alert severity levels"""
@@ -33,6 +35,55 @@ class AlertType(str, Enum):
     MOTION_ANOMALY = "motion_anomaly"
     SENSOR_FAILURE = "sensor_failure"
 
+# Plain string values of the enums above, used when building alerts
+SEV_LOW = AlertSeverity.LOW.value
+SEV_MEDIUM = AlertSeverity.MEDIUM.value
+SEV_HIGH = AlertSeverity.HIGH.value
+SEV_EXTREME = AlertSeverity.EXTREME.value
+AT_FIRE_RISK = AlertType.FIRE_RISK.value
+AT_UNSAFE_TEMPERATURE = AlertType.UNSAFE_TEMPERATURE.value
+AT_UNSAFE_HUMIDITY = AlertType.UNSAFE_HUMIDITY.value
+AT_RAPID_FLUCTUATION = AlertType.RAPID_FLUCTUATION.value
+AT_MOTION_ANOMALY = AlertType.MOTION_ANOMALY.value
+AT_SENSOR_FAILURE = AlertType.SENSOR_FAILURE.value
+
+@dataclass(slots=True)
+class Alert:
+    """Alert raised by the engine, converted to a dict only when stored or broadcast"""
+    device_id: str
+    alert_type: str
+    severity: str
+    message: str
+    sensor_values: Dict[str, Any]
+    triggered_at: str = ""
+    ml_based: Optional[bool] = None
+    
+    @classmethod
+    def from_prediction(cls, device_id: str, prediction: Dict[str, Any]) -> "Alert":
+        """Build an alert from an ML predictor result dictionary"""
+        return cls(
+            device_id=device_id,
+            alert_type=prediction["alert_type"],
+            severity=prediction["severity"],
+            message=prediction["message"],
+            sensor_values=prediction.get("sensor_values", {}),
+            ml_based=prediction.get("ml_based")
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to the alert dictionary used by the database and WebSocket clients"""
+        alert = {
+            "device_id": self.device_id,
+            "alert_type": self.alert_type,
+            "severity": self.severity,
+            "message": self.message,
+            "sensor_values": self.sensor_values,
+            "triggered_at": self.triggered_at
+        }
+        if self.ml_based is not None:
+            alert["ml_based"] = self.ml_based
+        return alert
+
 class AlertEngine:
     """Engine for evaluating sensor data and triggering alerts"""
     
@@ -60,29 +111,117 @@ class AlertEngine:
         self.temp_fluctuation_threshold = 3.0  # Rapid temp change in 5 minutes
         self.humidity_fluctuation_threshold = 10.0  # Rapid humidity change in 5 minutes
         
+        # Threshold tuples passed to the classification kernel, ordered low to high
+        self._temp_bands = (
+            self.temp_critical_min, self.temp_warning_min, self.temp_normal_min,
+            self.temp_normal_max, self.temp_warning_max, self.temp_critical_max
+        )
+        self._humidity_bands = (
+            self.humidity_critical_min, self.humidity_warning_min, self.humidity_normal_min,
+            self.humidity_normal_max, self.humidity_warning_max, self.humidity_critical_max
+        )
+        # Every threshold argument of classify_dht22 after the reading itself, fixed once here
+        self._dht22_limits = (self.temp_fire_risk,) + self._temp_bands + self._humidity_bands
+        
+        # (severity, message formatter) for each band code, indexed low to high
+        temp_normal = f"normal: {self.temp_normal_min}-{self.temp_normal_max}°C"
+        self._temp_table = (
+            (SEV_EXTREME, "❄️ EXTREME: Temperature critically low ({:.1f}°C)".format),
+            (SEV_HIGH, f"❄️ WARNING: Temperature too low ({{:.1f}}°C, {temp_normal})".format),
+            (SEV_MEDIUM, f"❄️ ALERT: Temperature below normal ({{:.1f}}°C, {temp_normal})".format),
+            (None, None),
+            (SEV_MEDIUM, f"🌡️ ALERT: Temperature above normal ({{:.1f}}°C, {temp_normal})".format),
+            (SEV_HIGH, f"🌡️ WARNING: Temperature too high ({{:.1f}}°C, {temp_normal})".format),
+            (SEV_EXTREME, "🌡️ EXTREME: Temperature critically high ({:.1f}°C)".format)
+        )
+        humidity_normal = f"normal: {self.humidity_normal_min}-{self.humidity_normal_max}%"
+        self._humidity_table = (
+            (SEV_EXTREME, f"💨 EXTREME: Humidity critically low ({{:.1f}}%, {humidity_normal})".format),
+            (SEV_HIGH, f"💨 WARNING: Humidity too low ({{:.1f}}%, {humidity_normal})".format),
+            (SEV_MEDIUM, f"💨 ALERT: Humidity below normal ({{:.1f}}%, {humidity_normal})".format),
+            (None, None),
+            (SEV_MEDIUM, f"💧 ALERT: Humidity above normal ({{:.1f}}%, {humidity_normal})".format),
+            (SEV_HIGH, f"💧 WARNING: Humidity too high ({{:.1f}}%, {humidity_normal})".format),
+            (SEV_EXTREME, f"💧 EXTREME: Humidity critically high ({{:.1f}}%, {humidity_normal})".format)
+        )
+        
+        # Warm the kernel so Numba compiles at startup rather than on the first reading
+        classify_dht22(20.0, 45.0, *self._dht22_limits)
+        
         # Time windows for trend analysis
         self.trend_window_minutes = 5
         self.spike_window_minutes = 2
-        
-        # ML-based alert prediction
-        self.use_ml = use_ml and ML_AVAILABLE
+        self.history_window_minutes = 10  # Same lookback as the recent readings query in api/main.py
+        
+        # Per-device, per-sensor history kept as fixed-size NumPy ring buffers
+        self.history_size = 20  # Same limit as the recent readings query in api/main.py
+        self._buffers: Dict[Tuple[str, str], RecentRingBuffer] = {}
+        
+        # Alert message formatters with the threshold text substituted up front
+        self._msg_fire_risk = f"🔥 EXTREME FIRE RISK: Temperature reached {{:.1f}}°C (threshold: {self.temp_fire_risk}°C)".format
+        self._msg_fire_evacuate = "🚨 EVACUATE IMMEDIATELY: Fire risk detected! Temperature {:.1f}°C. People detected in room - EVACUATE NOW!".format
+        self._msg_temp_spike = "🔥 FIRE RISK: Rapid temperature spike detected (+{:.1f}°C in short time)".format
+        self._msg_humidity_drop = "🔥 FIRE RISK: Unexpected humidity drop detected (-{:.1f}% with high temperature)".format
+        self._msg_temp_fluctuation = f"⚠️ RAPID FLUCTUATION: Temperature fluctuated {{:.1f}}°C in {self.trend_window_minutes} minutes (range: {{:.1f}}°C - {{:.1f}}°C)".format
+        self._msg_humidity_fluctuation = f"⚠️ RAPID FLUCTUATION: Humidity fluctuated {{:.1f}}% in {self.trend_window_minutes} minutes (range: {{:.1f}}% - {{:.1f}}%)".format
+        self._msg_extended_motion = "⚠️ Extended motion detected ({}/10 recent readings)".format
+        self._msg_sensor_failure = "⚠️ SENSOR FAILURE: Ultrasonic sensor reading invalid ({:.1f}cm, expected: 2-400cm)".format
+        
+        # ML-based alert prediction (optional - imported and loaded in the background on first use)
+        self.use_ml = use_ml
+        self.short_circuit_on_ml = True  # Skip rule-based fire/fluctuation checks after an extreme ML fire alert
         self.ml_predictor = None
+        self._ml_loader: Optional[threading.Thread] = None
         
-        if self.use_ml:
-            try:
-                # Determine models directory path
-                models_dir = os.path.join(
-                    os.path.dirname(os.path.dirname(__file__)),
-                    "ml_models", "models"
-                )
-                self.ml_predictor = MLAlertPredictor(models_dir=models_dir)
-                self.ml_predictor.load_models()
-                print("✓ ML Alert Predictor initialized")
-            except Exception as e:
-                print(f"⚠️ Failed to initialize ML Alert Predictor: {e}")
-                self.use_ml = False
-                self.ml_predictor = None
+    def _ensure_ml_loaded(self) -> bool:
+        """
+        Start loading the ML predictor in the background the first time it is needed
+        
+        Returns:
+            True once the predictor is ready; readings before that use rule-based checks only
+        """
+        if self.ml_predictor is not None:
+            return True
+        
+        if self._ml_loader is None:
+            self._ml_loader = threading.Thread(
+                target=self._load_ml_predictor, name="ml-predictor-loader", daemon=True
+            )
+            self._ml_loader.start()
+        return False
+    
+    def _load_ml_predictor(self):
+        """Import the ML predictor and load its models (runs on the loader thread)"""
+        try:
+            from ml_models.ml_alert_predictor import MLAlertPredictor
+        except ImportError:
+            # ML dependencies not installed - will work without ML models
+            self.use_ml = False
+            return
+        
+        try:
+            # Determine models directory path
+            models_dir = os.path.join(
+                os.path.dirname(os.path.dirname(__file__)),
+                "ml_models", "models"
+            )
+            predictor = MLAlertPredictor(models_dir=models_dir)
+            predictor.load_models()
+            self.ml_predictor = predictor
+            print("✓ ML Alert Predictor initialized")
+        except Exception as e:
+            print(f"⚠️ Failed to initialize ML Alert Predictor: {e}")
+            self.use_ml = False
+    
+    def needs_recent_readings(self, device_id: str, sensor_type: str) -> bool:
+        """
+        Whether evaluate_sensor_reading needs stored readings for this device and sensor
         
+        They only seed the ring buffer the first time a device's sensor is seen; after that
+        the buffer holds the history, so callers can skip the database query.
+        """
+        return sensor_type in ("dht22", "pir") and (device_id, sensor_type) not in self._buffers
+    
     def evaluate_sensor_reading(
         self, 
         device_id: str,
@@ -90,7 +229,7 @@ class AlertEngine:
         sensor_data: Dict[str, Any],
         timestamp: int,
         recent_readings: Optional[List[Dict[str, Any]]] = None
-    ) -> List[Dict[str, Any]]:
+    ) -> List[Alert]:
         """
         Evaluate sensor reading and return list of alerts if any
         
@@ -102,7 +241,7 @@ class AlertEngine:
             recent_readings: Recent readings for trend analysis
             
         Returns:
-            List of alert dictionaries
+            List of Alert objects (use Alert.to_dict() to serialize)
         """
         alerts = []
         
@@ -113,6 +252,61 @@ class AlertEngine:
         elif sensor_type == "ultrasonic":
             alerts.extend(self._evaluate_ultrasonic(device_id, sensor_data, timestamp, recent_readings))
         
+        # Stamp every alert from this reading with the same trigger time
+        if alerts:
+            triggered_at = datetime.utcnow().isoformat()
+            for alert in alerts:
+                alert.triggered_at = triggered_at
+        
+        return alerts
+    
+    def evaluate_batch(
+        self,
+        device_ids: List[str],
+        temperatures: np.ndarray,
+        humidities: np.ndarray,
+        timestamps: np.ndarray,
+        recent_readings: Optional[Dict[str, List[Dict[str, Any]]]] = None
+    ) -> List[Alert]:
+        """
+        Evaluate a batch of DHT22 readings, classifying thresholds for all of them at once
+        
+        Readings are applied in order, so several readings from one device behave
+        the same as consecutive evaluate_sensor_reading calls.
+        
+        Args:
+            device_ids: Device identifier for each reading
+            temperatures: Temperatures in °C (NaN for a missing value)
+            humidities: Relative humidities in % (NaN for a missing value)
+            timestamps: Unix timestamps
+            recent_readings: Optional recent readings per device, used to seed history and for ML
+            
+        Returns:
+            List of Alert objects (use Alert.to_dict() to serialize)
+        """
+        temperatures = np.asarray(temperatures, np.float64)
+        humidities = np.asarray(humidities, np.float64)
+        timestamps = np.asarray(timestamps, np.int64)
+        recent_readings = recent_readings or {}
+        
+        temp_bands = classify_bands(temperatures, *self._temp_bands)
+        humidity_bands = classify_bands(humidities, *self._humidity_bands)
+        fire_risk = temperatures >= self.temp_fire_risk
+        valid = ~(np.isnan(temperatures) | np.isnan(humidities))
+        
+        alerts = []
+        for i in np.flatnonzero(valid):
+            device_id = device_ids[i]
+            alerts.extend(self._evaluate_dht22_classified(
+                device_id, float(temperatures[i]), float(humidities[i]), int(timestamps[i]),
+                recent_readings.get(device_id), int(temp_bands[i]), int(humidity_bands[i]), bool(fire_risk[i])
+            ))
+        
+        if alerts:
+            triggered_at = datetime.utcnow().isoformat()
+            for alert in alerts:
+                alert.triggered_at = triggered_at
+        
         return alerts
     
     def _evaluate_dht22(
@@ -121,7 +315,7 @@ class AlertEngine:
         sensor_data: Dict[str, Any],
         timestamp: int,
         recent_readings: Optional[List[Dict[str, Any]]] = None
-    ) -> List[Dict[str, Any]]:
+    ) -> List[Alert]:
         """Evaluate DHT22 temperature and humidity data"""
         alerts = []
         
@@ -131,167 +325,255 @@ class AlertEngine:
         if temperature is None or humidity is None:
             return alerts
         
+        temp_band, humidity_band, fire_risk = classify_dht22(
+            temperature, humidity, *self._dht22_limits
+        )
+        return self._evaluate_dht22_classified(
+            device_id, temperature, humidity, timestamp, recent_readings,
+            temp_band, humidity_band, fire_risk
+        )
+    
+    def _evaluate_dht22_classified(
+        self,
+        device_id: str,
+        temperature: float,
+        humidity: float,
+        timestamp: int,
+        recent_readings: Optional[List[Dict[str, Any]]],
+        temp_band: int,
+        humidity_band: int,
+        fire_risk: bool
+    ) -> List[Alert]:
+        """Run the ML and rule-based DHT22 checks for a reading whose bands are already known"""
+        alerts = []
+        
+        buf = self._buffer(device_id, "dht22", timestamp, recent_readings)
+        # Record the reading before the checks: the stored history these rules were written
+        # against already held the current reading, so spikes and fluctuations include it
+        buf.push(timestamp, temperature=temperature, humidity=humidity)
+        ml_extreme_fire = False
+        
         # ML-based predictions (if available)
-        if self.use_ml and self.ml_predictor:
+        if self.use_ml and self._ensure_ml_loaded():
             try:
+                history = self._buffered_readings(buf, "dht22", timestamp)
+                
                 # ML fire risk prediction
                 ml_fire_alert = self.ml_predictor.predict_fire_risk(
-                    temperature, humidity, recent_readings
+                    temperature, humidity, history
                 )
                 if ml_fire_alert:
-                    ml_fire_alert["device_id"] = device_id
-                    ml_fire_alert["triggered_at"] = datetime.utcnow().isoformat()
-                    alerts.append(ml_fire_alert)
+                    alerts.append(Alert.from_prediction(device_id, ml_fire_alert))
+                    ml_extreme_fire = ml_fire_alert.get("severity") == SEV_EXTREME
                 
                 # ML temperature anomaly prediction
                 ml_temp_alert = self.ml_predictor.predict_temperature_anomaly(
-                    temperature, humidity, recent_readings
+                    temperature, humidity, history
                 )
                 if ml_temp_alert:
-                    ml_temp_alert["device_id"] = device_id
-                    ml_temp_alert["triggered_at"] = datetime.utcnow().isoformat()
-                    alerts.append(ml_temp_alert)
+                    alerts.append(Alert.from_prediction(device_id, ml_temp_alert))
             except Exception as e:
                 print(f"⚠️ ML prediction error: {e}")
                 # Continue with rule-based evaluation
         
-        # Rule-based checks (always run as fallback/verification)
-        # Check for fire risk conditions
-        fire_alerts = self._check_fire_risk(device_id, temperature, humidity, timestamp, recent_readings)
-        alerts.extend(fire_alerts)
+        # Rule-based checks (fallback/verification)
+        # The fire-risk and fluctuation passes are skipped once ML has raised an extreme fire alert
+        run_trend_checks = not (ml_extreme_fire and self.short_circuit_on_ml)
+        if run_trend_checks:
+            stats = self._scan_history(buf, timestamp)
+            
+            # Check for fire risk conditions
+            fire_alerts = self._check_fire_risk(device_id, temperature, humidity, recent_readings, fire_risk, stats)
+            alerts.extend(fire_alerts)
         
         # Check for unsafe temperature
-        temp_alerts = self._check_temperature(device_id, temperature, timestamp, recent_readings)
-        alerts.extend(temp_alerts)
+        if temp_band != BAND_NORMAL:
+            alerts.extend(self._check_temperature(device_id, temperature, temp_band))
         
         # Check for unsafe humidity
-        humidity_alerts = self._check_humidity(device_id, humidity, timestamp, recent_readings)
-        alerts.extend(humidity_alerts)
+        if humidity_band != BAND_NORMAL:
+            alerts.extend(self._check_humidity(device_id, humidity, humidity_band))
         
         # Check for rapid fluctuations
-        fluctuation_alerts = self._check_fluctuations(device_id, temperature, humidity, timestamp, recent_readings)
-        alerts.extend(fluctuation_alerts)
+        if run_trend_checks:
+            fluctuation_alerts = self._check_fluctuations(device_id, temperature, humidity, stats)
+            alerts.extend(fluctuation_alerts)
         
         return alerts
     
-    def _check_fire_risk(
+    def _buffer(
         self,
         device_id: str,
-        temperature: float,
-        humidity: float,
+        sensor_type: str,
         timestamp: int,
         recent_readings: Optional[List[Dict[str, Any]]]
+    ) -> RecentRingBuffer:
+        """Get a device's ring buffer for a sensor, seeding it from stored readings on first use"""
+        key = (device_id, sensor_type)
+        buf = self._buffers.get(key)
+        if buf is not None:
+            return buf
+        
+        buf = RecentRingBuffer(self.history_size)
+        self._buffers[key] = buf
+        if not recent_readings:
+            return buf
+        
+        # Only readings before the current one - the caller pushes it
+        history = sorted(
+            (r for r in recent_readings
+             if r.get("sensor_type") == sensor_type and r.get("timestamp", 0) < timestamp),
+            key=lambda r: r.get("timestamp", 0)
+        )
+        for r in history:
+            data = r.get("data", _EMPTY)
+            if sensor_type == "dht22":
+                temperature = data.get("temperature_c")
+                humidity = data.get("humidity_percent")
+                if temperature is not None and humidity is not None:
+                    buf.push(r["timestamp"], temperature=temperature, humidity=humidity)
+            elif sensor_type == "pir":
+                buf.push(r["timestamp"], motion=bool(data.get("motion_detected", False)))
+        return buf
+    
+    def _buffered_readings(
+        self,
+        buf: RecentRingBuffer,
+        sensor_type: str,
+        timestamp: int
     ) -> List[Dict[str, Any]]:
+        """Rebuild recent reading rows (newest first, as the database returns them) from a ring buffer for the ML predictor"""
+        since = timestamp - self.history_window_minutes * 60
+        rows = []
+        i = buf.head
+        for _ in range(buf.n):
+            i = i - 1 if i > 0 else buf.capacity - 1
+            ts = int(buf.ts[i])
+            if ts < since:
+                continue
+            if sensor_type == "dht22":
+                data = {"temperature_c": float(buf.temp[i]), "humidity_percent": float(buf.hum[i])}
+            else:
+                data = {"motion_detected": bool(buf.motion[i])}
+            rows.append({"sensor_type": sensor_type, "timestamp": ts, "data": data})
+        return rows
+    
+    def _scan_history(self, buf: RecentRingBuffer, timestamp: int) -> HistoryStats:
+        """Scan a DHT22 ring buffer once for the fire-risk and fluctuation windows"""
+        if buf.n == 0:
+            return HistoryStats(0, 0.0, 0.0, 0, 0.0, 0.0, 0.0, 0.0)
+        
+        return HistoryStats(*scan_history(
+            buf.temp, buf.hum, buf.ts, buf.n,
+            timestamp - self.history_window_minutes * 60,
+            timestamp - self.trend_window_minutes * 60
+        ))
+    
+    def _check_fire_risk(
+        self,
+        device_id: str,
+        temperature: float,
+        humidity: float,
+        recent_readings: Optional[List[Dict[str, Any]]],
+        fire_risk: bool,
+        stats: HistoryStats
+    ) -> List[Alert]:
         """Check for fire risk conditions and occupancy for evacuation alerts"""
         alerts = []
         
-        # Check for room occupancy (motion detected)
-        room_occupied = self._check_room_occupancy(recent_readings)
+        # Room occupancy (motion detected) is only looked up once an alert needs it
+        room_occupied = None
         
         # Condition 1: Temperature exceeds fire risk threshold (40°C)
-        if temperature >= self.temp_fire_risk:
+        if fire_risk:
+            room_occupied = self._check_room_occupancy(recent_readings)
+            
             # Base fire risk alert
-            fire_alert = {
-                "device_id": device_id,
-                "alert_type": AlertType.FIRE_RISK.value,
-                "severity": AlertSeverity.EXTREME.value,
-                "message": f"🔥 EXTREME FIRE RISK: Temperature reached {temperature:.1f}°C (threshold: {self.temp_fire_risk}°C)",
-                "sensor_values": {
+            fire_alert = Alert(
+                device_id=device_id,
+                alert_type=AT_FIRE_RISK,
+                severity=SEV_EXTREME,
+                message=self._msg_fire_risk(temperature),
+                sensor_values={
                     "temperature_c": temperature,
                     "humidity_percent": humidity,
                     "room_occupied": room_occupied
-                },
-                "triggered_at": datetime.utcnow().isoformat()
-            }
+                }
+            )
             alerts.append(fire_alert)
             
             # If room is occupied, add evacuation alert
             if room_occupied:
-                evacuation_alert = {
-                    "device_id": device_id,
-                    "alert_type": AlertType.FIRE_RISK.value,
-                    "severity": AlertSeverity.EXTREME.value,
-                    "message": f"🚨 EVACUATE IMMEDIATELY: Fire risk detected! Temperature {temperature:.1f}°C. People detected in room - EVACUATE NOW!",
-                    "sensor_values": {
+                evacuation_alert = Alert(
+                    device_id=device_id,
+                    alert_type=AT_FIRE_RISK,
+                    severity=SEV_EXTREME,
+                    message=self._msg_fire_evacuate(temperature),
+                    sensor_values={
                         "temperature_c": temperature,
                         "humidity_percent": humidity,
                         "room_occupied": True,
                         "motion_detected": True,
                         "evacuation_required": True
-                    },
-                    "triggered_at": datetime.utcnow().isoformat()
-                }
+                    }
+                )
                 alerts.append(evacuation_alert)
         
         # Condition 2: Rapid temperature spike (indicates fire)
-        if recent_readings:
-            recent_temps = [
-                r.get("data", {}).get("temperature_c") 
-                for r in recent_readings 
-                if r.get("sensor_type") == "dht22" and r.get("data", {}).get("temperature_c") is not None
-            ]
-            if recent_temps:
-                max_recent_temp = max(recent_temps)
-                temp_increase = temperature - max_recent_temp
+        if stats.history_count:
+            temp_increase = temperature - stats.history_temp_max
+            
+            if temp_increase >= self.temp_spike_threshold:
+                if room_occupied is None:
+                    room_occupied = self._check_room_occupancy(recent_readings)
                 
-                if temp_increase >= self.temp_spike_threshold:
-                    spike_alert = {
-                        "device_id": device_id,
-                        "alert_type": AlertType.FIRE_RISK.value,
-                        "severity": AlertSeverity.HIGH.value,
-                        "message": f"🔥 FIRE RISK: Rapid temperature spike detected (+{temp_increase:.1f}°C in short time)",
-                        "sensor_values": {
+                spike_alert = Alert(
+                    device_id=device_id,
+                    alert_type=AT_FIRE_RISK,
+                    severity=SEV_HIGH,
+                    message=self._msg_temp_spike(temp_increase),
+                    sensor_values={
+                        "temperature_c": temperature,
+                        "humidity_percent": humidity,
+                        "temperature_increase": temp_increase,
+                        "room_occupied": room_occupied
+                    }
+                )
+                alerts.append(spike_alert)
+                
+                # If room is occupied and temperature is high, add evacuation alert
+                if room_occupied and temperature >= 35.0:
+                    evacuation_alert = Alert(
+                        device_id=device_id,
+                        alert_type=AT_FIRE_RISK,
+                        severity=SEV_EXTREME,
+                        message="🚨 EVACUATE: Rapid temperature rise detected! People in room - EVACUATE IMMEDIATELY!",
+                        sensor_values={
                             "temperature_c": temperature,
                             "humidity_percent": humidity,
                             "temperature_increase": temp_increase,
-                            "room_occupied": room_occupied
-                        },
-                        "triggered_at": datetime.utcnow().isoformat()
-                    }
-                    alerts.append(spike_alert)
-                    
-                    # If room is occupied and temperature is high, add evacuation alert
-                    if room_occupied and temperature >= 35.0:
-                        evacuation_alert = {
-                            "device_id": device_id,
-                            "alert_type": AlertType.FIRE_RISK.value,
-                            "severity": AlertSeverity.EXTREME.value,
-                            "message": f"🚨 EVACUATE: Rapid temperature rise detected! People in room - EVACUATE IMMEDIATELY!",
-                            "sensor_values": {
-                                "temperature_c": temperature,
-                                "humidity_percent": humidity,
-                                "temperature_increase": temp_increase,
-                                "room_occupied": True,
-                                "evacuation_required": True
-                            },
-                            "triggered_at": datetime.utcnow().isoformat()
+                            "room_occupied": True,
+                            "evacuation_required": True
                         }
-                        alerts.append(evacuation_alert)
+                    )
+                    alerts.append(evacuation_alert)
         
         # Condition 3: Unexpected humidity drop (fire consumes moisture)
-        if recent_readings:
-            recent_humidities = [
-                r.get("data", {}).get("humidity_percent")
-                for r in recent_readings
-                if r.get("sensor_type") == "dht22" and r.get("data", {}).get("humidity_percent") is not None
-            ]
-            if recent_humidities:
-                max_recent_humidity = max(recent_humidities)
-                humidity_drop = max_recent_humidity - humidity
-                
-                if humidity_drop >= self.humidity_drop_threshold and temperature > 25.0:
-                    alerts.append({
-                        "device_id": device_id,
-                        "alert_type": AlertType.FIRE_RISK.value,
-                        "severity": AlertSeverity.MEDIUM.value,
-                        "message": f"🔥 FIRE RISK: Unexpected humidity drop detected (-{humidity_drop:.1f}% with high temperature)",
-                        "sensor_values": {
-                            "temperature_c": temperature,
-                            "humidity_percent": humidity,
-                            "humidity_drop": humidity_drop
-                        },
-                        "triggered_at": datetime.utcnow().isoformat()
-                    })
+        if stats.history_count:
+            humidity_drop = stats.history_humidity_max - humidity
+            
+            if humidity_drop >= self.humidity_drop_threshold and temperature > 25.0:
+                alerts.append(Alert(
+                    device_id=device_id,
+                    alert_type=AT_FIRE_RISK,
+                    severity=SEV_MEDIUM,
+                    message=self._msg_humidity_drop(humidity_drop),
+                    sensor_values={
+                        "temperature_c": temperature,
+                        "humidity_percent": humidity,
+                        "humidity_drop": humidity_drop
+                    }
+                ))
         
         return alerts
     
@@ -316,7 +598,7 @@ class AlertEngine:
         motion_readings = [
             r for r in recent_readings[-20:]  # Check last 20 readings
             if r.get("sensor_type") == "pir"
-            and r.get("data", {}).get("motion_detected", False)
+            and r.get("data", _EMPTY).get("motion_detected", False)
         ]
         
         # Room is considered occupied if motion detected in recent readings
@@ -327,196 +609,91 @@ class AlertEngine:
         self,
         device_id: str,
         temperature: float,
-        timestamp: int,
-        recent_readings: Optional[List[Dict[str, Any]]]
-    ) -> List[Dict[str, Any]]:
-        """Check for unsafe temperature conditions"""
-        alerts = []
-        
-        # Critical temperature (extreme)
-        if temperature <= self.temp_critical_min or temperature >= self.temp_critical_max:
-            severity = AlertSeverity.EXTREME.value
-            if temperature <= self.temp_critical_min:
-                message = f"❄️ EXTREME: Temperature critically low ({temperature:.1f}°C)"
-            else:
-                message = f"🌡️ EXTREME: Temperature critically high ({temperature:.1f}°C)"
-            
-            alerts.append({
-                "device_id": device_id,
-                "alert_type": AlertType.UNSAFE_TEMPERATURE.value,
-                "severity": severity,
-                "message": message,
-                "sensor_values": {"temperature_c": temperature},
-                "triggered_at": datetime.utcnow().isoformat()
-            })
-        
-        # Warning temperature (high)
-        elif temperature <= self.temp_warning_min or temperature >= self.temp_warning_max:
-            severity = AlertSeverity.HIGH.value
-            if temperature <= self.temp_warning_min:
-                message = f"❄️ WARNING: Temperature too low ({temperature:.1f}°C, normal: {self.temp_normal_min}-{self.temp_normal_max}°C)"
-            else:
-                message = f"🌡️ WARNING: Temperature too high ({temperature:.1f}°C, normal: {self.temp_normal_min}-{self.temp_normal_max}°C)"
-            
-            alerts.append({
-                "device_id": device_id,
-                "alert_type": AlertType.UNSAFE_TEMPERATURE.value,
-                "severity": severity,
-                "message": message,
-                "sensor_values": {"temperature_c": temperature},
-                "triggered_at": datetime.utcnow().isoformat()
-            })
-        
-        # Outside normal range (medium)
-        elif temperature < self.temp_normal_min or temperature > self.temp_normal_max:
-            severity = AlertSeverity.MEDIUM.value
-            if temperature < self.temp_normal_min:
-                message = f"❄️ ALERT: Temperature below normal ({temperature:.1f}°C, normal: {self.temp_normal_min}-{self.temp_normal_max}°C)"
-            else:
-                message = f"🌡️ ALERT: Temperature above normal ({temperature:.1f}°C, normal: {self.temp_normal_min}-{self.temp_normal_max}°C)"
-            
-            alerts.append({
-                "device_id": device_id,
-                "alert_type": AlertType.UNSAFE_TEMPERATURE.value,
-                "severity": severity,
-                "message": message,
-                "sensor_values": {"temperature_c": temperature},
-                "triggered_at": datetime.utcnow().isoformat()
-            })
-        
-        return alerts
+        band: int
+    ) -> List[Alert]:
+        """Build the unsafe temperature alert for a non-normal temperature band"""
+        severity, message = self._temp_table[band]
+        return [Alert(
+            device_id=device_id,
+            alert_type=AT_UNSAFE_TEMPERATURE,
+            severity=severity,
+            message=message(temperature),
+            sensor_values={"temperature_c": temperature}
+        )]
     
     def _check_humidity(
         self,
         device_id: str,
         humidity: float,
-        timestamp: int,
-        recent_readings: Optional[List[Dict[str, Any]]]
-    ) -> List[Dict[str, Any]]:
-        """Check for unsafe humidity conditions"""
-        alerts = []
-        
-        # Critical humidity (extreme)
-        if humidity <= self.humidity_critical_min or humidity >= self.humidity_critical_max:
-            severity = AlertSeverity.EXTREME.value
-            if humidity <= self.humidity_critical_min:
-                message = f"💨 EXTREME: Humidity critically low ({humidity:.1f}%, normal: {self.humidity_normal_min}-{self.humidity_normal_max}%)"
-            else:
-                message = f"💧 EXTREME: Humidity critically high ({humidity:.1f}%, normal: {self.humidity_normal_min}-{self.humidity_normal_max}%)"
-            
-            alerts.append({
-                "device_id": device_id,
-                "alert_type": AlertType.UNSAFE_HUMIDITY.value,
-                "severity": severity,
-                "message": message,
-                "sensor_values": {"humidity_percent": humidity},
-                "triggered_at": datetime.utcnow().isoformat()
-            })
-        
-        # Warning humidity (high)
-        elif humidity <= self.humidity_warning_min or humidity >= self.humidity_warning_max:
-            severity = AlertSeverity.HIGH.value
-            if humidity <= self.humidity_warning_min:
-                message = f"💨 WARNING: Humidity too low ({humidity:.1f}%, normal: {self.humidity_normal_min}-{self.humidity_normal_max}%)"
-            else:
-                message = f"💧 WARNING: Humidity too high ({humidity:.1f}%, normal: {self.humidity_normal_min}-{self.humidity_normal_max}%)"
-            
-            alerts.append({
-                "device_id": device_id,
-                "alert_type": AlertType.UNSAFE_HUMIDITY.value,
-                "severity": severity,
-                "message": message,
-                "sensor_values": {"humidity_percent": humidity},
-                "triggered_at": datetime.utcnow().isoformat()
-            })
-        
-        # Outside normal range (medium)
-        elif humidity < self.humidity_normal_min or humidity > self.humidity_normal_max:
-            severity = AlertSeverity.MEDIUM.value
-            if humidity < self.humidity_normal_min:
-                message = f"💨 ALERT: Humidity below normal ({humidity:.1f}%, normal: {self.humidity_normal_min}-{self.humidity_normal_max}%)"
-            else:
-                message = f"💧 ALERT: Humidity above normal ({humidity:.1f}%, normal: {self.humidity_normal_min}-{self.humidity_normal_max}%)"
-            
-            alerts.append({
-                "device_id": device_id,
-                "alert_type": AlertType.UNSAFE_HUMIDITY.value,
-                "severity": severity,
-                "message": message,
-                "sensor_values": {"humidity_percent": humidity},
-                "triggered_at": datetime.utcnow().isoformat()
-            })
-        
-        return alerts
+        band: int
+    ) -> List[Alert]:
+        """Build the unsafe humidity alert for a non-normal humidity band"""
+        severity, message = self._humidity_table[band]
+        return [Alert(
+            device_id=device_id,
+            alert_type=AT_UNSAFE_HUMIDITY,
+            severity=severity,
+            message=message(humidity),
+            sensor_values={"humidity_percent": humidity}
+        )]
     
     def _check_fluctuations(
         self,
         device_id: str,
         temperature: float,
         humidity: float,
-        timestamp: int,
-        recent_readings: Optional[List[Dict[str, Any]]]
-    ) -> List[Dict[str, Any]]:
+        stats: HistoryStats
+    ) -> List[Alert]:
         """Check for rapid fluctuations indicating danger"""
         alerts = []
         
-        if not recent_readings or len(recent_readings) < 2:
+        # Need at least two readings within the trend window, this one included
+        if stats.trend_count < 2:
             return alerts
         
-        # Get recent DHT22 readings within time window
-        window_start = timestamp - (self.trend_window_minutes * 60)
-        recent_dht22 = [
-            r for r in recent_readings
-            if r.get("sensor_type") == "dht22" 
-            and r.get("timestamp", 0) >= window_start
-            and r.get("data", {}).get("temperature_c") is not None
-            and r.get("data", {}).get("humidity_percent") is not None
-        ]
-        
-        if len(recent_dht22) < 2:
+        # Calculate temperature and humidity fluctuation
+        min_temp = min(stats.trend_temp_min, temperature)
+        max_temp = max(stats.trend_temp_max, temperature)
+        temp_range = max_temp - min_temp
+        min_humidity = min(stats.trend_humidity_min, humidity)
+        max_humidity = max(stats.trend_humidity_max, humidity)
+        humidity_range = max_humidity - min_humidity
+        
+        # Common case: both ranges are steady
+        temp_threshold = self.temp_fluctuation_threshold
+        humidity_threshold = self.humidity_fluctuation_threshold
+        if temp_range < temp_threshold and humidity_range < humidity_threshold:
             return alerts
         
-        # Calculate temperature fluctuation
-        temps = [r.get("data", {}).get("temperature_c") for r in recent_dht22]
-        temps.append(temperature)
-        temp_range = max(temps) - min(temps)
-        
-        if temp_range >= self.temp_fluctuation_threshold:
-            alerts.append({
-                "device_id": device_id,
-                "alert_type": AlertType.RAPID_FLUCTUATION.value,
-                "severity": AlertSeverity.HIGH.value,
-                "message": f"⚠️ RAPID FLUCTUATION: Temperature fluctuated {temp_range:.1f}°C in {self.trend_window_minutes} minutes (range: {min(temps):.1f}°C - {max(temps):.1f}°C)",
-                "sensor_values": {
+        if temp_range >= temp_threshold:
+            alerts.append(Alert(
+                device_id=device_id,
+                alert_type=AT_RAPID_FLUCTUATION,
+                severity=SEV_HIGH,
+                message=self._msg_temp_fluctuation(temp_range, min_temp, max_temp),
+                sensor_values={
                     "temperature_c": temperature,
                     "humidity_percent": humidity,
                     "temperature_range": temp_range,
-                    "min_temperature": min(temps),
-                    "max_temperature": max(temps)
-                },
-                "triggered_at": datetime.utcnow().isoformat()
-            })
-        
-        # Calculate humidity fluctuation
-        humidities = [r.get("data", {}).get("humidity_percent") for r in recent_dht22]
-        humidities.append(humidity)
-        humidity_range = max(humidities) - min(humidities)
-        
-        if humidity_range >= self.humidity_fluctuation_threshold:
-            alerts.append({
-                "device_id": device_id,
-                "alert_type": AlertType.RAPID_FLUCTUATION.value,
-                "severity": AlertSeverity.MEDIUM.value,
-                "message": f"⚠️ RAPID FLUCTUATION: Humidity fluctuated {humidity_range:.1f}% in {self.trend_window_minutes} minutes (range: {min(humidities):.1f}% - {max(humidities):.1f}%)",
-                "sensor_values": {
+                    "min_temperature": min_temp,
+                    "max_temperature": max_temp
+                }
+            ))
+        
+        if humidity_range >= humidity_threshold:
+            alerts.append(Alert(
+                device_id=device_id,
+                alert_type=AT_RAPID_FLUCTUATION,
+                severity=SEV_MEDIUM,
+                message=self._msg_humidity_fluctuation(humidity_range, min_humidity, max_humidity),
+                sensor_values={
                     "temperature_c": temperature,
                     "humidity_percent": humidity,
                     "humidity_range": humidity_range,
-                    "min_humidity": min(humidities),
-                    "max_humidity": max(humidities)
-                },
-                "triggered_at": datetime.utcnow().isoformat()
-            })
+                    "min_humidity": min_humidity,
+                    "max_humidity": max_humidity
+                }
+            ))
         
         return alerts
     
@@ -526,53 +703,54 @@ class AlertEngine:
         sensor_data: Dict[str, Any],
         timestamp: int,
         recent_readings: Optional[List[Dict[str, Any]]]
-    ) -> List[Dict[str, Any]]:
+    ) -> List[Alert]:
         """Evaluate PIR motion sensor data"""
         alerts = []
         
         motion_detected = sensor_data.get("motion_detected", False)
+        buf = self._buffer(device_id, "pir", timestamp, recent_readings)
         
         # ML-based motion anomaly detection (if available)
-        if self.use_ml and self.ml_predictor:
+        if self.use_ml and self._ensure_ml_loaded():
             try:
                 # Get distance from recent readings if available
                 distance = None
                 if recent_readings:
                     for r in recent_readings:
                         if r.get("sensor_type") == "ultrasonic":
-                            distance = r.get("data", {}).get("distance_cm")
+                            distance = r.get("data", _EMPTY).get("distance_cm")
                             break
                 
                 ml_motion_alert = self.ml_predictor.predict_motion_anomaly(
-                    motion_detected, distance, recent_readings
+                    motion_detected, distance, self._buffered_readings(buf, "pir", timestamp)
                 )
                 if ml_motion_alert:
-                    ml_motion_alert["device_id"] = device_id
-                    ml_motion_alert["triggered_at"] = datetime.utcnow().isoformat()
-                    alerts.append(ml_motion_alert)
+                    alerts.append(Alert.from_prediction(device_id, ml_motion_alert))
             except Exception as e:
                 print(f"⚠️ ML motion prediction error: {e}")
         
         # Rule-based motion anomaly detection
-        # Detect extended motion (potential issue)
-        if recent_readings and len(recent_readings) >= 5:
-            motion_count = sum(1 for r in recent_readings[-10:]
-                              if r.get("sensor_type") == "pir" 
-                              and r.get("data", {}).get("motion_detected", False))
+        # Detect extended motion (potential issue) over the last 10 readings, this one included
+        count, motion_count = recent_motion(
+            buf.motion, buf.ts, buf.head, buf.n, timestamp - self.history_window_minutes * 60, 9
+        )
+        if count + 1 >= 5:
+            motion_count = int(motion_count) + bool(motion_detected)
             
             # If motion detected for extended period, might indicate issue
             if motion_count >= 8 and motion_detected:
-                alerts.append({
-                    "device_id": device_id,
-                    "alert_type": AlertType.MOTION_ANOMALY.value,
-                    "severity": AlertSeverity.LOW.value,
-                    "message": f"⚠️ Extended motion detected ({motion_count}/10 recent readings)",
-                    "sensor_values": {
+                alerts.append(Alert(
+                    device_id=device_id,
+                    alert_type=AT_MOTION_ANOMALY,
+                    severity=SEV_LOW,
+                    message=self._msg_extended_motion(motion_count),
+                    sensor_values={
                         "motion_detected": motion_detected,
                         "motion_count": motion_count
-                    },
-                    "triggered_at": datetime.utcnow().isoformat()
-                })
+                    }
+                ))
+        
+        buf.push(timestamp, motion=bool(motion_detected))
         
         return alerts
     
@@ -582,7 +760,7 @@ class AlertEngine:
         sensor_data: Dict[str, Any],
         timestamp: int,
         recent_readings: Optional[List[Dict[str, Any]]]
-    ) -> List[Dict[str, Any]]:
+    ) -> List[Alert]:
         """Evaluate ultrasonic distance sensor data"""
         alerts = []
         
@@ -592,15 +770,14 @@ class AlertEngine:
             return alerts
         
         # Check for sensor failure (invalid readings)
-        if distance < 0 or distance > 400:  # HC-SR04 range is 2-400cm
-            alerts.append({
-                "device_id": device_id,
-                "alert_type": AlertType.SENSOR_FAILURE.value,
-                "severity": AlertSeverity.MEDIUM.value,
-                "message": f"⚠️ SENSOR FAILURE: Ultrasonic sensor reading invalid ({distance:.1f}cm, expected: 2-400cm)",
-                "sensor_values": {"distance_cm": distance},
-                "triggered_at": datetime.utcnow().isoformat()
-            })
+        if not 0 <= distance <= 400:  # HC-SR04 range is 2-400cm
+            alerts.append(Alert(
+                device_id=device_id,
+                alert_type=AT_SENSOR_FAILURE,
+                severity=SEV_MEDIUM,
+                message=self._msg_sensor_failure(distance),
+                sensor_values={"distance_cm": distance}
+            ))
         
         # Optional: Add distance-based alerts (e.g., object too close, sudden changes)
         
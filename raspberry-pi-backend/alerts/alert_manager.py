@@ -4,10 +4,15 @@ Handles push notifications, email alerts, and dashboard notifications
 """
 
 import aiosmtplib
+from email.message import Message
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Dict, List
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from string import Template
 import os
+import time
 from dotenv import load_dotenv
 from datetime import datetime
 import asyncio
@@ -15,20 +20,159 @@ try:
     import aiohttp
 except ImportError:
     aiohttp = None
+try:
+    from google.oauth2 import service_account
+    from google.auth.transport.requests import Request as GoogleAuthRequest
+except ImportError:
+    service_account = None
+try:
+    from database.sqlite_db import insert_alert_log
+except ImportError:
+    insert_alert_log = None
 
 load_dotenv()
 
+FCM_SCOPE = "https://www.googleapis.com/auth/firebase.messaging"
+FCM_MULTICAST_LIMIT = 500  # Targets sent concurrently per chunk, as in FCM multicast
+
+# Email bodies are built once; each alert only substitutes its own fields
+_EMAIL_TEXT = Template("""
+FALL DETECTION ALERT
+
+A fall has been detected for user: ${user_id}
+
+Severity Score: ${severity}/10 (${severity_level})
+Location: ${location}
+Time: ${timestamp}
+Verified: ${verified}
+
+Event ID: ${event_id}
+
+Please check on the person immediately.
+
+---
+Fall Detection System
+""")
+
+_EMAIL_HTML = Template("""
+<html>
+<body>
+<h2 style="color: red;">🚨 FALL DETECTION ALERT</h2>
+<p><strong>A fall has been detected for user:</strong> ${user_id}</p>
+<table border="1" cellpadding="10">
+<tr><td><strong>Severity Score</strong></td><td>${severity}/10 (${severity_level})</td></tr>
+<tr><td><strong>Location</strong></td><td>${location}</td></tr>
+<tr><td><strong>Time</strong></td><td>${timestamp}</td></tr>
+<tr><td><strong>Verified</strong></td><td>${verified}</td></tr>
+<tr><td><strong>Event ID</strong></td><td>${event_id}</td></tr>
+</table>
+<p><strong style="color: red;">Please check on the person immediately.</strong></p>
+<hr>
+<p><small>Fall Detection System</small></p>
+</body>
+</html>
+""")
+
+# Severity level indexed by the whole part of a 0-10 severity score
+_SEVERITY_LEVELS = ("LOW",) * 4 + ("MEDIUM",) * 3 + ("HIGH",) * 4
+
+# Alert channel bit flags; the channel name lists for every mask are built once
+CHANNEL_EMAIL = 1
+CHANNEL_PUSH = 2
+CHANNEL_DASHBOARD = 4
+_CHANNEL_NAMES = ((CHANNEL_EMAIL, "email"), (CHANNEL_PUSH, "push"), (CHANNEL_DASHBOARD, "dashboard"))
+_CHANNEL_LISTS = tuple(
+    tuple(name for flag, name in _CHANNEL_NAMES if mask & flag) for mask in range(8)
+)
+
+@dataclass(slots=True)
+class AlertContext:
+    """Fall event fields shared by every alert channel, computed once per alert"""
+    event_id: str
+    user_id: str
+    severity: float
+    severity_level: str
+    location: str
+    timestamp: str
+    timestamp_iso: str
+    verified: str
+    
+    @classmethod
+    def from_fall_event(cls, fall_event: Dict, event_id: str) -> "AlertContext":
+        """Build the context for a fall event"""
+        severity = fall_event["severity_score"]
+        timestamp = fall_event["timestamp"]
+        return cls(
+            event_id=event_id,
+            user_id=fall_event["user_id"],
+            severity=severity,
+            severity_level=_SEVERITY_LEVELS[max(0, min(int(severity), 10))],
+            location=fall_event.get("location", "Unknown"),
+            timestamp=str(timestamp),
+            timestamp_iso=timestamp.isoformat(),
+            verified="Yes" if fall_event["verified"] else "No"
+        )
+
+def create_http_session() -> Optional["aiohttp.ClientSession"]:
+    """Create the shared keep-alive HTTP session used for push notifications (None without aiohttp)"""
+    if aiohttp is None:
+        return None
+    connector = aiohttp.TCPConnector(limit=8, ttl_dns_cache=300, keepalive_timeout=75)
+    return aiohttp.ClientSession(connector=connector)
+
 class AlertManager:
     """Manages all alert channels"""
     
-    def __init__(self):
+    def __init__(self, http_session: Optional["aiohttp.ClientSession"] = None):
+        """
+        Initialize alert manager
+        
+        Args:
+            http_session: Shared aiohttp session for push notifications; owned and closed by the caller
+        """
         self.smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
         self.smtp_port = int(os.getenv("SMTP_PORT", 587))
         self.smtp_username = os.getenv("SMTP_USERNAME", "")
         self.smtp_password = os.getenv("SMTP_PASSWORD", "")
         self.alert_email_from = os.getenv("ALERT_EMAIL_FROM", "")
         self.alert_email_to = os.getenv("ALERT_EMAIL_TO", "")
-        self.fcm_server_key = os.getenv("FCM_SERVER_KEY", "")
+        self.fcm_project_id = os.getenv("FCM_PROJECT_ID", "")
+        self.fcm_credentials_file = os.getenv("FCM_CREDENTIALS_FILE", os.getenv("GOOGLE_APPLICATION_CREDENTIALS", ""))
+        self.fcm_device_tokens = [token.strip() for token in os.getenv("FCM_DEVICE_TOKENS", "").split(",") if token.strip()]
+        self.http_session = http_session
+        self._background_tasks = set()  # Strong references to fire-and-forget tasks
+        
+        # Long-lived SMTP session, opened on the first email and reused for later alerts
+        self.smtp_keepalive_interval = 60  # Seconds between NOOPs on an idle session
+        self._smtp: Optional[aiosmtplib.SMTP] = None
+        self._smtp_lock = asyncio.Lock()
+        self._smtp_keepalive: Optional[asyncio.Task] = None
+        
+        # Per-user notification preferences, cached so alerts skip the lookup
+        self.preferences_ttl = 60  # Seconds before a cached entry is refetched
+        self.preferences_cache_size = 256
+        self._preferences_cache: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        
+        # FCM HTTP v1 OAuth token, reused until it is close to its one hour expiry
+        self.fcm_token_refresh_interval = 50 * 60
+        self._fcm_credentials = None
+        self._fcm_access_token: Optional[str] = None
+        self._fcm_token_fetched_at = 0.0
+        self._fcm_token_lock = asyncio.Lock()
+    
+    async def close(self):
+        """Close the shared SMTP session (called on application shutdown)"""
+        if self._smtp_keepalive:
+            self._smtp_keepalive.cancel()
+            self._smtp_keepalive = None
+        
+        async with self._smtp_lock:
+            if self._smtp and self._smtp.is_connected:
+                try:
+                    await self._smtp.quit()
+                except Exception as e:
+                    print(f"Error closing SMTP session: {e}")
+            self._smtp = None
     
     async def send_fall_alert(self, fall_event: Dict, event_id: str):
         """Send fall alert through all channels"""
@@ -36,25 +180,29 @@ class AlertManager:
             # Get user preferences
             user_prefs = await self._get_user_preferences(fall_event.get("user_id", "default"))
             
-            alert_channels = []
+            context = AlertContext.from_fall_event(fall_event, event_id)
             
-            # Send email alert
+            # Send email and push notification concurrently
+            sends = []
             if user_prefs.get("email_enabled", True):
-                email_sent = await self._send_email_alert(fall_event, event_id)
-                if email_sent:
-                    alert_channels.append("email")
-            
-            # Send push notification
+                html = user_prefs.get("email_format", "html") == "html"
+                sends.append((CHANNEL_EMAIL, self._send_email_alert(context, html)))
             if user_prefs.get("push_enabled", True):
-                push_sent = await self._send_push_notification(fall_event, event_id)
-                if push_sent:
-                    alert_channels.append("push")
+                sends.append((CHANNEL_PUSH, self._send_push_notification(context)))
+            
+            results = await asyncio.gather(*(send for _, send in sends), return_exceptions=True)
             
             # Dashboard notification (always sent)
-            alert_channels.append("dashboard")
+            channel_mask = CHANNEL_DASHBOARD
+            for (flag, _), sent in zip(sends, results):
+                if sent is True:
+                    channel_mask |= flag
+            alert_channels = list(_CHANNEL_LISTS[channel_mask])
             
-            # Log alert status
-            await self._log_alert_status(event_id, alert_channels)
+            # Log alert status in the background
+            task = asyncio.create_task(self._log_alert_status(event_id, alert_channels))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
             
             return {
                 "alert_id": event_id,
@@ -66,148 +214,245 @@ class AlertManager:
             print(f"Error sending fall alert: {e}")
             return None
     
-    async def _send_email_alert(self, fall_event: Dict, event_id: str) -> bool:
-        """Send email alert"""
+    async def _send_email_alert(self, context: AlertContext, html: bool = True) -> bool:
+        """
+        Send email alert
+        
+        Args:
+            context: Shared fall alert fields
+            html: Include an HTML alternative; otherwise send a single plain-text part
+        """
         try:
             if not self.smtp_username or not self.smtp_password:
                 print("Email credentials not configured")
                 return False
             
+            # Email body
+            fields = {
+                "user_id": context.user_id,
+                "severity": context.severity,
+                "severity_level": context.severity_level,
+                "location": context.location,
+                "timestamp": context.timestamp,
+                "verified": context.verified,
+                "event_id": context.event_id
+            }
+            text = _EMAIL_TEXT.substitute(fields)
+            
             # Create email message
-            message = MIMEMultipart("alternative")
+            if html:
+                message = MIMEMultipart("alternative")
+                message.attach(MIMEText(text, "plain"))
+                message.attach(MIMEText(_EMAIL_HTML.substitute(fields), "html"))
+            else:
+                message = MIMEText(text, "plain")
             message["From"] = self.alert_email_from
             message["To"] = self.alert_email_to
-            message["Subject"] = f"🚨 FALL DETECTED - Severity: {fall_event['severity_score']}/10"
-            
-            # Email body
-            severity = fall_event["severity_score"]
-            severity_level = "LOW" if severity < 4 else "MEDIUM" if severity < 7 else "HIGH"
-            
-            text = f"""
-FALL DETECTION ALERT
-
-A fall has been detected for user: {fall_event['user_id']}
-
-Severity Score: {severity}/10 ({severity_level})
-Location: {fall_event.get('location', 'Unknown')}
-Time: {fall_event['timestamp']}
-Verified: {'Yes' if fall_event['verified'] else 'No'}
-
-Event ID: {event_id}
-
-Please check on the person immediately.
-
----
-Fall Detection System
-"""
-            
-            html = f"""
-<html>
-<body>
-<h2 style="color: red;">🚨 FALL DETECTION ALERT</h2>
-<p><strong>A fall has been detected for user:</strong> {fall_event['user_id']}</p>
-<table border="1" cellpadding="10">
-<tr><td><strong>Severity Score</strong></td><td>{severity}/10 ({severity_level})</td></tr>
-<tr><td><strong>Location</strong></td><td>{fall_event.get('location', 'Unknown')}</td></tr>
-<tr><td><strong>Time</strong></td><td>{fall_event['timestamp']}</td></tr>
-<tr><td><strong>Verified</strong></td><td>{'Yes' if fall_event['verified'] else 'No'}</td></tr>
-<tr><td><strong>Event ID</strong></td><td>{event_id}</td></tr>
-</table>
-<p><strong style="color: red;">Please check on the person immediately.</strong></p>
-<hr>
-<p><small>Fall Detection System</small></p>
-</body>
-</html>
-"""
-            
-            part1 = MIMEText(text, "plain")
-            part2 = MIMEText(html, "html")
-            message.attach(part1)
-            message.attach(part2)
+            message["Subject"] = f"🚨 FALL DETECTED - Severity: {context.severity}/10"
             
             # Send email
-            await aiosmtplib.send(
-                message,
-                hostname=self.smtp_server,
-                port=self.smtp_port,
-                username=self.smtp_username,
-                password=self.smtp_password,
-                use_tls=True
-            )
+            await self._smtp_send(message)
             
-            print(f"Email alert sent for event {event_id}")
+            print(f"Email alert sent for event {context.event_id}")
             return True
             
         except Exception as e:
             print(f"Error sending email alert: {e}")
             return False
     
-    async def _send_push_notification(self, fall_event: Dict, event_id: str) -> bool:
-        """Send push notification via FCM"""
+    async def _smtp_connect(self) -> aiosmtplib.SMTP:
+        """Open and authenticate a new SMTP session"""
+        smtp = aiosmtplib.SMTP(hostname=self.smtp_server, port=self.smtp_port, use_tls=True)
+        await smtp.connect()
+        await smtp.login(self.smtp_username, self.smtp_password)
+        return smtp
+    
+    async def _smtp_send(self, message: Message):
+        """Send a message over the shared SMTP session, reconnecting once if it was dropped"""
+        async with self._smtp_lock:
+            if self._smtp is None or not self._smtp.is_connected:
+                self._smtp = await self._smtp_connect()
+            
+            try:
+                await self._smtp.send_message(message)
+            except (aiosmtplib.SMTPServerDisconnected, ConnectionError):
+                self._smtp = await self._smtp_connect()
+                await self._smtp.send_message(message)
+        
+        if self._smtp_keepalive is None or self._smtp_keepalive.done():
+            self._smtp_keepalive = asyncio.create_task(self._smtp_keepalive_loop())
+    
+    async def _smtp_keepalive_loop(self):
+        """Send NOOP on the idle SMTP session until it drops; the next email reconnects"""
+        while True:
+            await asyncio.sleep(self.smtp_keepalive_interval)
+            async with self._smtp_lock:
+                if self._smtp is None or not self._smtp.is_connected:
+                    self._smtp = None
+                    return
+                try:
+                    await self._smtp.noop()
+                except Exception:
+                    self._smtp = None
+                    return
+    
+    async def _send_push_notification(self, context: AlertContext) -> bool:
+        """Send push notification via FCM HTTP v1, to each configured device token or the alert topic"""
         try:
-            if not self.fcm_server_key:
-                print("FCM server key not configured")
+            if not self.fcm_project_id or not self.fcm_credentials_file:
+                print("FCM project or credentials not configured")
                 return False
             
             if aiohttp is None:
                 print("aiohttp not installed. Install with: pip install aiohttp")
                 return False
             
-            # FCM API endpoint
+            if service_account is None:
+                print("google-auth not installed. Install with: pip install google-auth")
+                return False
             
-            url = "https://fcm.googleapis.com/fcm/send"
+            # FCM API endpoint
+            url = f"https://fcm.googleapis.com/v1/projects/{self.fcm_project_id}/messages:send"
             headers = {
-                "Authorization": f"key={self.fcm_server_key}",
+                "Authorization": f"Bearer {await self._get_fcm_access_token()}",
                 "Content-Type": "application/json"
             }
             
-            severity = fall_event["severity_score"]
-            severity_level = "LOW" if severity < 4 else "MEDIUM" if severity < 7 else "HIGH"
-            
-            payload = {
-                "to": "/topics/fall_alerts",  # Or specific device token
+            message = {
                 "notification": {
                     "title": "🚨 Fall Detected",
-                    "body": f"Severity: {severity}/10 ({severity_level}) - {fall_event.get('location', 'Unknown')}",
-                    "sound": "default",
-                    "priority": "high"
+                    "body": f"Severity: {context.severity}/10 ({context.severity_level}) - {context.location}"
                 },
                 "data": {
-                    "event_id": event_id,
-                    "severity": str(severity),
-                    "location": fall_event.get("location", "unknown"),
-                    "timestamp": fall_event["timestamp"].isoformat()
+                    "event_id": str(context.event_id),
+                    "severity": str(context.severity),
+                    "location": context.location,
+                    "timestamp": context.timestamp_iso
                 },
-                "priority": "high"
+                "android": {"priority": "high", "notification": {"sound": "default"}},
+                "apns": {"payload": {"aps": {"sound": "default"}}}
             }
+            targets = [{"token": token} for token in self.fcm_device_tokens] or [{"topic": "fall_alerts"}]
+            
+            if self.http_session is None or self.http_session.closed:
+                # No shared session (e.g. standalone scripts) - fall back to a one-off session
+                async with aiohttp.ClientSession() as session:
+                    sent = await self._send_multicast(session, url, headers, message, targets)
+            else:
+                sent = await self._send_multicast(self.http_session, url, headers, message, targets)
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, headers=headers) as response:
-                    if response.status == 200:
-                        print(f"Push notification sent for event {event_id}")
-                        return True
-                    else:
-                        print(f"FCM error: {response.status}")
-                        return False
+            if sent:
+                print(f"Push notification sent for event {context.event_id} ({sent}/{len(targets)} targets)")
+            return sent > 0
                         
         except Exception as e:
             print(f"Error sending push notification: {e}")
             return False
     
+    async def _get_fcm_access_token(self) -> str:
+        """Return the cached FCM OAuth token, refreshing it every fcm_token_refresh_interval seconds"""
+        async with self._fcm_token_lock:
+            now = time.monotonic()
+            if self._fcm_access_token and now - self._fcm_token_fetched_at < self.fcm_token_refresh_interval:
+                return self._fcm_access_token
+            
+            if self._fcm_credentials is None:
+                self._fcm_credentials = service_account.Credentials.from_service_account_file(
+                    self.fcm_credentials_file, scopes=[FCM_SCOPE]
+                )
+            # google-auth refreshes over blocking HTTP, so keep it off the event loop
+            await asyncio.to_thread(self._fcm_credentials.refresh, GoogleAuthRequest())
+            self._fcm_access_token = self._fcm_credentials.token
+            self._fcm_token_fetched_at = now
+            return self._fcm_access_token
+    
+    async def _send_multicast(
+        self,
+        session: "aiohttp.ClientSession",
+        url: str,
+        headers: Dict,
+        message: Dict,
+        targets: List[Dict]
+    ) -> int:
+        """
+        Send one message to many targets over the shared session, FCM_MULTICAST_LIMIT at a time
+        
+        Returns:
+            Number of targets the message was delivered to
+        """
+        sent = 0
+        for start in range(0, len(targets), FCM_MULTICAST_LIMIT):
+            chunk = targets[start:start + FCM_MULTICAST_LIMIT]
+            results = await asyncio.gather(
+                *(self._post_push(session, url, {"message": {**message, **target}}, headers) for target in chunk),
+                return_exceptions=True
+            )
+            sent += sum(1 for result in results if result is True)
+        return sent
+    
+    async def _post_push(
+        self,
+        session: "aiohttp.ClientSession",
+        url: str,
+        payload: Dict,
+        headers: Dict
+    ) -> bool:
+        """POST a single push notification message to FCM"""
+        async with session.post(url, json=payload, headers=headers) as response:
+            if response.status == 200:
+                return True
+            if response.status == 401:
+                # Token revoked or expired early - fetch a new one for the next alert
+                self._fcm_access_token = None
+            print(f"FCM error: {response.status}")
+            return False
+    
+    def invalidate_user_preferences(self, user_id: Optional[str] = None):
+        """
+        Drop cached notification preferences after they change
+        
+        Args:
+            user_id: User whose entry to drop; None clears the whole cache
+        """
+        if user_id is None:
+            self._preferences_cache.clear()
+        else:
+            self._preferences_cache.pop(user_id, None)
+    
     async def _get_user_preferences(self, user_id: str) -> Dict:
-        """Get user notification preferences"""
+        """Get user notification preferences, served from the TTL cache when fresh"""
+        now = time.monotonic()
+        cached = self._preferences_cache.get(user_id)
+        if cached is not None and now - cached[0] < self.preferences_ttl:
+            self._preferences_cache.move_to_end(user_id)
+            return cached[1]
+        
+        preferences = await self._fetch_user_preferences(user_id)
+        self._preferences_cache[user_id] = (now, preferences)
+        self._preferences_cache.move_to_end(user_id)
+        if len(self._preferences_cache) > self.preferences_cache_size:
+            self._preferences_cache.popitem(last=False)
+        
+        return preferences
+    
+    async def _fetch_user_preferences(self, user_id: str) -> Dict:
+        """Load user notification preferences"""
         # In production, fetch from database
         # For now, return defaults
         return {
             "email_enabled": True,
             "push_enabled": True,
+            "email_format": "html",  # "html" or "text"
             "alert_threshold": 5.0
         }
     
     async def _log_alert_status(self, event_id: str, channels: List[str]):
         """Log alert status to database"""
+        if insert_alert_log is None:
+            print("Alert log database not available")
+            return
+        
         try:
-            from database.sqlite_db import insert_alert_log
             await insert_alert_log(event_id, channels, "sent")
         except Exception as e:
             print(f"Error logging alert status: {e}")
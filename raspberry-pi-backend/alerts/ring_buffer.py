@@ -0,0 +1,35 @@
+"""
+Recent Reading Ring Buffer
+Fixed-size history of one sensor on one device, stored as parallel NumPy columns
+"""
+
+import numpy as np
+
+class RecentRingBuffer:
+    """Ring buffer of recent readings with one NumPy array per field"""
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, np.int64)
+        self.temp = np.zeros(capacity, np.float64)
+        self.hum = np.zeros(capacity, np.float64)
+        self.motion = np.zeros(capacity, np.uint8)
+        self.head = 0
+        self.n = 0
+    
+    def push(
+        self,
+        timestamp: int,
+        temperature: float = 0.0,
+        humidity: float = 0.0,
+        motion: bool = False
+    ):
+        """Append a reading, overwriting the oldest entry when full"""
+        head = self.head
+        self.ts[head] = timestamp
+        self.temp[head] = temperature
+        self.hum[head] = humidity
+        self.motion[head] = motion
+        self.head = (head + 1) % self.capacity
+        if self.n < self.capacity:
+            self.n += 1
@@ -7,18 +7,27 @@ import os
 # Add parent directory to path so imports work when running as script
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, ORJSONResponse
 from typing import List, Optional
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from auth.dependencies import require_viewer_or_above, require_admin
 from database.alert_db import (
     get_alerts, get_latest_alerts, get_alert_by_id,
-    acknowledge_alert, count_alerts, insert_alert
+    acknowledge_alert, insert_alert, get_alert_stats as db_get_alert_stats,
+    get_alerts_version
 )
 from alerts.alert_engine import AlertType, AlertSeverity
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/alerts", tags=["alerts"])
 
+# Alert list endpoints serialize database rows directly (rows already match AlertResponse)
+_RowsResponse = ORJSONResponse if orjson is not None else JSONResponse
+
 class AlertCreate(BaseModel):
     """Model for creating an alert"""
     device_id: str
@@ -67,7 +76,7 @@ async def create_alert(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating alert: {str(e)}")
 
-@router.get("", response_model=List[AlertResponse])
+@router.get("", response_model=None, responses={200: {"model": List[AlertResponse]}})
 async def get_alerts_endpoint(
     device_id: Optional[str] = Query(None, description="Filter by device ID"),
     alert_type: Optional[str] = Query(None, description="Filter by alert type"),
@@ -87,20 +96,27 @@ async def get_alerts_endpoint(
             limit=limit,
             offset=offset
         )
-        return [AlertResponse(**alert) for alert in alerts]
+        return _RowsResponse(alerts)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching alerts: {str(e)}")
 
-@router.get("/latest", response_model=List[AlertResponse])
+@router.get("/latest", response_model=None, responses={200: {"model": List[AlertResponse]}})
 async def get_latest_alerts_endpoint(
+    request: Request,
     limit: int = Query(10, ge=1, le=100),
     unacknowledged_only: bool = Query(False, description="Only return unacknowledged alerts"),
     current_user: dict = Depends(require_viewer_or_above)
 ):
     """Get latest alerts for real-time dashboard (requires authentication)"""
+    # Answer conditional polls with a single-row lookup while no alert has changed
+    etag = f'"{await get_alerts_version()}-{limit}-{int(unacknowledged_only)}"'
+    cache_headers = {"ETag": etag, "Cache-Control": "private, max-age=5"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cache_headers)
+    
     try:
         alerts = await get_latest_alerts(limit=limit, unacknowledged_only=unacknowledged_only)
-        return [AlertResponse(**alert) for alert in alerts]
+        return _RowsResponse(alerts, headers=cache_headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching latest alerts: {str(e)}")
 
@@ -113,7 +129,7 @@ async def get_alert_endpoint(
     alert = await get_alert_by_id(alert_id)
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
-    return AlertResponse(**alert)
+    return alert
 
 @router.post("/{alert_id}/acknowledge", status_code=200)
 async def acknowledge_alert_endpoint(
@@ -151,36 +167,25 @@ async def get_alert_stats(
 ):
     """Get alert statistics summary (requires authentication)"""
     try:
-        total = await count_alerts()
-        unacknowledged = await count_alerts(acknowledged=False)
-        
-        # Count by severity
-        low = await count_alerts(severity="low")
-        medium = await count_alerts(severity="medium")
-        high = await count_alerts(severity="high")
-        extreme = await count_alerts(severity="extreme")
-        
-        # Count by type
-        fire_risk = await count_alerts(alert_type="fire_risk")
-        unsafe_temp = await count_alerts(alert_type="unsafe_temperature")
-        unsafe_humidity = await count_alerts(alert_type="unsafe_humidity")
-        fluctuation = await count_alerts(alert_type="rapid_fluctuation")
+        stats = await db_get_alert_stats()
+        by_severity = stats["by_severity"]
+        by_type = stats["by_type"]
         
         return {
-            "total": total,
-            "unacknowledged": unacknowledged,
-            "acknowledged": total - unacknowledged,
+            "total": stats["total"],
+            "unacknowledged": stats["unacknowledged"],
+            "acknowledged": stats["total"] - stats["unacknowledged"],
             "by_severity": {
-                "low": low,
-                "medium": medium,
-                "high": high,
-                "extreme": extreme
+                "low": by_severity.get("low", 0),
+                "medium": by_severity.get("medium", 0),
+                "high": by_severity.get("high", 0),
+                "extreme": by_severity.get("extreme", 0)
             },
             "by_type": {
-                "fire_risk": fire_risk,
-                "unsafe_temperature": unsafe_temp,
-                "unsafe_humidity": unsafe_humidity,
-                "rapid_fluctuation": fluctuation
+                "fire_risk": by_type.get("fire_risk", 0),
+                "unsafe_temperature": by_type.get("unsafe_temperature", 0),
+                "unsafe_humidity": by_type.get("unsafe_humidity", 0),
+                "rapid_fluctuation": by_type.get("rapid_fluctuation", 0)
             }
         }
     except Exception as e:
@@ -0,0 +1,44 @@
+"""
+Standalone MQTT Ingestor
+Runs MQTT ingestion, database writes, fall detection and alerts without the HTTP API.
+API workers started with BACKEND_ROLE=api receive its WebSocket events through Redis.
+"""
+
+import os
+import asyncio
+import signal
+from dotenv import load_dotenv
+
+# Configuration is read when main is imported, so load it and fix the role first
+load_dotenv()
+os.environ["BACKEND_ROLE"] = "ingestor"
+
+import main
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+async def run():
+    """Run the ingestion pipeline until SIGINT/SIGTERM"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C raises KeyboardInterrupt instead
+
+    async with main.lifespan(main.app):
+        await stop.wait()
+
+
+if __name__ == "__main__":
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
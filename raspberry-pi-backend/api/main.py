@@ -5,23 +5,49 @@ Raspberry Pi Backend for Fall Detection System
 
 import sys
 import os
+import asyncio
+import importlib.util
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import time
 # Add parent directory to path so imports work when running as script
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from dotenv import load_dotenv
+# Settings below (BACKEND_ROLE, LOG_LEVEL, ...) are read at import, so .env is loaded first
+load_dotenv()
+
+from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional, Set
 from datetime import datetime, timedelta
 import uvicorn
 from contextlib import asynccontextmanager
+from anyio import to_thread
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
 
 from database.sqlite_db import (
-    init_database, insert_sensor_reading, insert_fall_event,
+    init_database, insert_sensor_reading, insert_sensor_readings, prune_sensor_readings, insert_fall_event, close_alert_log,
     get_sensor_readings as db_get_sensor_readings, get_fall_events, get_fall_event,
     acknowledge_fall_event, get_devices as db_get_devices, get_recent_room_sensor_data,
     count_fall_events, count_sensor_readings, count_active_devices,
-    get_sensors as db_get_sensors, update_sensor_status
+    get_sensors as db_get_sensors, update_sensor_status, DB_PATH
 )
 from database.alert_db import (
     insert_alert, get_alerts, get_latest_alerts, get_alert_by_id,
@@ -30,7 +56,7 @@ from database.alert_db import (
 from alerts.alert_engine import AlertEngine
 from mqtt_broker.mqtt_client import MQTTClient
 from ml_models.fall_detector import FallDetector
-from alerts.alert_manager import AlertManager
+from alerts.alert_manager import AlertManager, create_http_session
 from database.alert_db import (
     insert_alert, get_alerts, get_latest_alerts, get_alert_by_id,
     acknowledge_alert, count_alerts, get_recent_sensor_readings
@@ -38,12 +64,83 @@ from database.alert_db import (
 from auth.routes import router as auth_router
 from auth.dependencies import get_current_user, require_viewer_or_above, require_admin
 
+# Per-message logging goes through `logging` so its formatting is skipped below LOG_LEVEL (default INFO).
+# Records are handed to a listener thread, so writing them to stderr never blocks the event loop.
+log_queue = queue.SimpleQueue()
+log_stream_handler = logging.StreamHandler()
+log_stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+log_listener = logging.handlers.QueueListener(log_queue, log_stream_handler)
+if not logging.getLogger().handlers:
+    logging.getLogger().addHandler(logging.handlers.QueueHandler(log_queue))
+    logging.getLogger().setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    log_listener.start()
+    atexit.register(log_listener.stop)
+logger = logging.getLogger(__name__)
+
 
 # ==================== Global Variables ====================
 mqtt_client: Optional[MQTTClient] = None
 fall_detector: Optional[FallDetector] = None
 alert_manager: Optional[AlertManager] = None
-websocket_connections: List[WebSocket] = []
+http_session = None  # Shared aiohttp session for outbound notifications (None without aiohttp)
+websocket_connections: Set[WebSocket] = set()
+MAX_WEBSOCKET_CONNECTIONS = 128
+WEBSOCKET_SEND_TIMEOUT = 0.5  # seconds; slower clients are dropped so they cannot stall broadcasts (<= WS_FLUSH_MAX_INTERVAL)
+WEBSOCKET_ACK_FRAME = json.dumps({"type": "ack", "message": "received"})  # Serialized once, sent per client message
+fall_queue: Optional[asyncio.Queue] = None  # Wearable payloads awaiting fall detection
+fall_workers: List[asyncio.Task] = []
+inference_pool: Optional[ThreadPoolExecutor] = None  # Runs fall detection off the event loop
+
+# Fall detection runs off the MQTT path on a few workers draining a bounded queue
+FALL_QUEUE_SIZE = 256
+FALL_WORKER_COUNT = 2
+FALL_BATCH_SIZE = 16
+DEFAULT_EXECUTOR_WORKERS = 4  # Bounds the loop's default pool (DNS lookups, asyncio.to_thread) on the Pi
+API_THREADS = int(os.getenv("API_THREADS", 8))  # AnyIO pool for sync dependencies/endpoints (default 40)
+
+reading_queue: Optional[asyncio.Queue] = None  # Sensor readings awaiting a batched database write
+recent_room_readings: deque = deque(maxlen=64)  # Latest room sensor readings, newest last, for fall verification
+ROOM_SENSOR_TYPES = frozenset({"room_sensor", "dht22", "pir", "ultrasonic", "combined"})
+ROOM_DATA_WINDOW = 60  # seconds
+ROOM_DATA_LIMIT = 20
+reading_writer: Optional[asyncio.Task] = None
+
+# Reading batches grow while the queue backs up and shrink again once it drains
+READING_QUEUE_SIZE = 5000
+READING_BATCH_MIN = 16
+READING_BATCH_MAX = 512
+READING_FLUSH_INTERVAL = 0.1  # seconds
+dropped_readings = 0  # Readings evicted from a full reading_queue since startup
+
+# Optional cap on sensor_readings rows, oldest first out; off by default so upgrades never delete history
+SENSOR_READINGS_MAX_ROWS = int(os.getenv("SENSOR_READINGS_MAX_ROWS", 0))
+READING_PRUNE_INTERVAL = 60  # seconds
+
+ws_outbox: List[dict] = []  # Sensor messages waiting for the next coalesced broadcast
+ws_flusher: Optional[asyncio.Task] = None
+
+# Sensor updates go out as one sensor_batch frame per window; the window widens under load
+WS_FLUSH_INTERVAL = 0.15  # seconds
+WS_FLUSH_MIN_INTERVAL = 0.05
+WS_FLUSH_MAX_INTERVAL = 0.5
+WS_BATCH_TARGET = 50  # Batches larger than this widen the window, smaller ones narrow it
+
+STATISTICS_TTL = 10  # seconds
+DEVICES_TTL = 2  # seconds
+READINGS_TTL = 2  # seconds; de-duplicates dashboard polls of the sensor reading endpoints
+READINGS_CACHE_MAX_LIMIT = 500  # Larger (ad-hoc) queries always go to the database
+
+EVENT_ID_PATTERN = re.compile(r"[0-9]+")  # Fall event IDs are SQLite row IDs
+
+# Process role: "all" ingests MQTT and serves the API in one process, "ingestor" (api/ingestor.py)
+# only ingests and publishes WebSocket events to Redis, "api" only serves HTTP/WebSocket and relays them
+BACKEND_ROLE = os.getenv("BACKEND_ROLE", "all").lower()
+REDIS_URL = os.getenv("REDIS_URL")
+SENSOR_EVENTS_CHANNEL = "sensor_events"
+redis_client = None  # Shared Redis connection in the ingestor and api roles
+event_publisher = None  # Redis client the ingestor publishes WebSocket frames to
+STATISTICS_CACHE_KEY = "stats:summary"  # /api/statistics result shared by all API workers
+event_relay: Optional[asyncio.Task] = None  # Forwards Redis frames to this API worker's clients
 
 # ==================== Pydantic Models ====================
 class SensorReading(BaseModel):
@@ -76,15 +173,41 @@ class AlertResponse(BaseModel):
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize and cleanup resources"""
-    global mqtt_client, fall_detector, alert_manager, alert_engine
-    
     # Startup
-    print("Initializing Fall Detection System...")
+    print(f"Initializing Fall Detection System ({BACKEND_ROLE})...")
+    
+    # Blocking helpers share a small pool instead of the default of up to cpu_count + 4 threads
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=DEFAULT_EXECUTOR_WORKERS, thread_name_prefix="default-executor")
+    )
+    # Likewise cap the AnyIO pool FastAPI uses for sync dependencies such as OAuth2PasswordRequestForm
+    to_thread.current_default_thread_limiter().total_tokens = API_THREADS
     
     # Initialize database
     await init_database()
     print("Database initialized")
     
+    if BACKEND_ROLE != "api":
+        await start_ingestion()
+    await start_event_channel()
+    
+    yield
+    
+    # Shutdown
+    print("Shutting down...")
+    if BACKEND_ROLE != "api":
+        await stop_ingestion()
+    await stop_event_channel()
+    print("Shutdown complete")
+
+async def start_ingestion():
+    """Start MQTT ingestion, fall detection and alerting"""
+    global mqtt_client, fall_detector, alert_manager, alert_engine, http_session, fall_queue, fall_workers, reading_queue, reading_writer, ws_flusher, inference_pool
+    
+    # Start the batched sensor reading writer before MQTT messages can arrive
+    reading_queue = asyncio.Queue(maxsize=READING_QUEUE_SIZE)
+    reading_writer = asyncio.create_task(sensor_reading_writer(reading_queue))
+    
     # Initialize MQTT client (non-blocking - allow API to start even if MQTT fails)
     mqtt_client = MQTTClient()
     try:
@@ -110,28 +233,85 @@ async def lifespan(app: FastAPI):
     await fall_detector.load_model()
     print("✓ Fall detector model loaded")
     
-    # Initialize alert manager
-    alert_manager = AlertManager()
+    # Initialize alert manager with a keep-alive HTTP session for push notifications
+    http_session = create_http_session()
+    alert_manager = AlertManager(http_session=http_session)
     print("✓ Alert manager initialized")
     
     # Initialize alert engine
     alert_engine = AlertEngine()
     print("✓ Alert engine initialized")
     
-    yield
+    # Start fall detection workers; inference itself runs on a single worker thread
+    inference_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fall-inference")
+    fall_queue = asyncio.Queue(maxsize=FALL_QUEUE_SIZE)
+    fall_workers = [asyncio.create_task(fall_detection_worker(fall_queue)) for _ in range(FALL_WORKER_COUNT)]
+    print(f"✓ Started {FALL_WORKER_COUNT} fall detection workers")
     
-    # Shutdown
-    print("Shutting down...")
+    # Start the coalesced WebSocket sensor broadcaster
+    ws_flusher = asyncio.create_task(websocket_flusher())
+
+async def stop_ingestion():
+    """Flush pending readings and release ingestion resources"""
+    global fall_workers, reading_writer, ws_flusher, inference_pool
+    if ws_flusher:
+        ws_flusher.cancel()
+        ws_flusher = None
+    for worker in fall_workers:
+        worker.cancel()
+    await asyncio.gather(*fall_workers, return_exceptions=True)
+    fall_workers = []
+    if inference_pool:
+        inference_pool.shutdown(wait=False)
+        inference_pool = None
+    if reading_writer:
+        # Sentinel lets the writer flush everything still queued before it exits
+        await reading_queue.put(None)
+        await reading_writer
+        reading_writer = None
     if mqtt_client:
         await mqtt_client.disconnect()
-    print("Shutdown complete")
+    if alert_manager:
+        await alert_manager.close()
+    await close_alert_log()
+    if http_session:
+        await http_session.close()
+
+async def start_event_channel():
+    """Connect to Redis when ingestion and the API run in separate processes"""
+    global redis_client, event_publisher, event_relay
+    if BACKEND_ROLE == "all":
+        return
+    if aioredis is None or not REDIS_URL:
+        print(f"⚠️  BACKEND_ROLE={BACKEND_ROLE} needs the redis package and REDIS_URL; WebSocket events will not cross processes")
+        return
+    
+    redis_client = aioredis.from_url(REDIS_URL, decode_responses=True)
+    if BACKEND_ROLE == "ingestor":
+        event_publisher = redis_client
+    else:
+        event_relay = asyncio.create_task(relay_redis_events(redis_client))
+    print(f"✓ Redis event channel '{SENSOR_EVENTS_CHANNEL}' ready")
+
+async def stop_event_channel():
+    """Stop relaying Redis events and close the connection"""
+    global redis_client, event_publisher, event_relay
+    if event_relay:
+        event_relay.cancel()
+        await asyncio.gather(event_relay, return_exceptions=True)
+        event_relay = None
+    if redis_client:
+        await redis_client.close()
+        redis_client = None
+        event_publisher = None
 
 # ==================== FastAPI App ====================
 app = FastAPI(
     title="Fall Detection System API",
     description="REST API for IoT-based fall detection system",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse
 )
 
 # Register authentication routes
@@ -152,6 +332,76 @@ app.add_middleware(
 
 
 # ==================== MQTT Message Handler ====================
+# Payload keys, built once instead of on every message
+_DEVICE_ID_KEYS = ("device_id", "deviceId")
+_SENSOR_TYPE_KEYS = ("sensor_type", "sensorType")
+_LOCATION_KEYS = ("location", "Location")
+_TIMESTAMP_KEYS = ("timestamp", "time", "Timestamp")
+_METADATA_FIELDS = frozenset(
+    _DEVICE_ID_KEYS + _SENSOR_TYPE_KEYS + _LOCATION_KEYS + _TIMESTAMP_KEYS
+    + ("topic", "received_at", "receivedAt")
+)
+# Sensor type aliases (lower case) -> canonical name; other types are kept as-is (e.g., "room_sensor")
+_SENSOR_TYPE_ALIASES = {
+    **dict.fromkeys(("pir", "motion", "motion_sensor"), "pir"),
+    **dict.fromkeys(("ultrasonic", "ultrasonic_sensor", "sr04", "hc-sr04", "distance"), "ultrasonic"),
+    **dict.fromkeys(("dht22", "dht", "temperature", "humidity", "temp_hum"), "dht22"),
+    "combined": "combined",
+}
+
+def _normalize_pir(value) -> dict:
+    """PIR primitive payload: "1" or 1 means motion"""
+    return {"motion_detected": value == "1" or value == 1}
+
+def _normalize_ultrasonic(value) -> dict:
+    """Ultrasonic primitive payload: distance in cm"""
+    try:
+        return {"distance_cm": float(value)}
+    except Exception:
+        return {"distance_cm": 0.0}
+
+def _normalize_value(value) -> dict:
+    """Other sensors keep the raw value"""
+    return {"value": value}
+
+# Sensor type -> builder of sensor_data for primitive payloads (e.g. "1" or "25.5")
+_PRIMITIVE_NORMALIZERS = {
+    "pir": _normalize_pir,
+    "ultrasonic": _normalize_ultrasonic,
+}
+
+def coerce_primitive(sensor_type: str, value) -> dict:
+    """Build sensor_data for a primitive payload value"""
+    return _PRIMITIVE_NORMALIZERS.get(sensor_type, _normalize_value)(value)
+
+def first_value(payload: dict, keys: tuple):
+    """Return the first truthy value among keys, or None"""
+    for key in keys:
+        value = payload.get(key)
+        if value:
+            return value
+    return None
+
+@lru_cache(maxsize=1024)
+def is_wearable_source(topic: str, device_id: str) -> bool:
+    """Whether a message comes from a wearable, cached per (topic, device) since both repeat for every message"""
+    return "wearable" in topic or "MICROBIT" in device_id.upper()
+
+@lru_cache(maxsize=256)
+def parse_topic(topic: str) -> tuple:
+    """
+    Split a sensor topic, cached since each device publishes on a fixed topic
+    
+    Topic format: sensors/pir/ESP8266_NODE_01 -> ("pir", "ESP8266_NODE_01")
+    
+    Returns:
+        Tuple of (sensor_type, device_id), None where the topic has no such level
+    """
+    parts = topic.split("/", 3)
+    sensor_type = parts[1] if len(parts) >= 2 else None
+    device_id = parts[2] if len(parts) >= 3 else None
+    return sensor_type, device_id
+
 async def handle_mqtt_message(topic: str, payload: dict):
     """Process incoming MQTT messages and store in database in real-time"""
     try:
@@ -169,46 +419,29 @@ async def handle_mqtt_message(topic: str, payload: dict):
                 except:
                     payload = {"value": str(payload), "raw": payload}
         
-        # Parse topic parts for extracting information
-        topic_parts = topic.split("/")
+        # Extract device_id and sensor_type from the payload first (priority: payload > topic)
+        device_id = first_value(payload, _DEVICE_ID_KEYS)
+        sensor_type = first_value(payload, _SENSOR_TYPE_KEYS)
         
-        # Extract device_id from payload or topic
-        # Topic format: sensors/pir/ESP8266_NODE_01 -> device_id is in topic_parts[2]
-        device_id = payload.get("device_id") or payload.get("deviceId")
-        if not device_id and len(topic_parts) >= 3:
-            # Extract from topic (e.g., "sensors/pir/ESP8266_NODE_01" -> "ESP8266_NODE_01")
-            device_id = topic_parts[2]
+        # Canonical payloads carry both, so the topic is only consulted when one is missing
+        if not device_id or not sensor_type:
+            topic_sensor_type, topic_device_id = parse_topic(topic)
+            device_id = device_id or topic_device_id
+            sensor_type = sensor_type or topic_sensor_type  # e.g., "dht22", "pir", "ultrasonic", "combined"
         if not device_id:
             device_id = "unknown"
-        
-        # Extract sensor_type from topic or payload
-        # Priority: payload > topic extraction
-        sensor_type = payload.get("sensor_type") or payload.get("sensorType")
         if not sensor_type:
-            # Try to extract from topic (e.g., "sensors/dht22/ESP8266_001" -> "dht22")
-            if len(topic_parts) >= 2:
-                sensor_type = topic_parts[1]  # e.g., "dht22", "pir", "ultrasonic", "combined"
-            else:
-                sensor_type = "unknown"
+            sensor_type = "unknown"
         
         # Normalize sensor type names
-        sensor_type_lower = sensor_type.lower()
-        if sensor_type_lower in ["pir", "motion", "motion_sensor"]:
-            sensor_type = "pir"
-        elif sensor_type_lower in ["ultrasonic", "ultrasonic_sensor", "sr04", "hc-sr04", "distance"]:
-            sensor_type = "ultrasonic"
-        elif sensor_type_lower in ["dht22", "dht", "temperature", "humidity", "temp_hum"]:
-            sensor_type = "dht22"
-        elif sensor_type_lower == "combined":
-            sensor_type = "combined"
-        # Keep other sensor types as-is (e.g., "room_sensor", etc.)
+        sensor_type = _SENSOR_TYPE_ALIASES.get(sensor_type.lower(), sensor_type)
         
         # Extract location from payload or topic
-        location = payload.get("location") or payload.get("Location")
-        # Don't use topic_parts[2] for location since that's device_id
+        location = first_value(payload, _LOCATION_KEYS)
+        # Don't use the topic's third level for location since that's device_id
         
-        # Extract timestamp from payload or use current time
-        timestamp = payload.get("timestamp") or payload.get("time") or payload.get("Timestamp")
+        # Extract timestamp from payload or use the arrival time stamped by the MQTT client
+        timestamp = first_value(payload, _TIMESTAMP_KEYS)
         if timestamp:
             # Convert to int if it's a float or string
             if isinstance(timestamp, float):
@@ -217,14 +450,9 @@ async def handle_mqtt_message(topic: str, payload: dict):
                 try:
                     timestamp = int(float(timestamp))
                 except:
-                    timestamp = int(datetime.utcnow().timestamp())
+                    timestamp = int(payload.get("received_at") or time.time())
         else:
-            timestamp = int(datetime.utcnow().timestamp())
-        
-        # Extract actual sensor data (exclude metadata fields)
-        metadata_fields = {"device_id", "deviceId", "sensor_type", "sensorType", 
-                          "timestamp", "time", "Timestamp", "location", "Location", 
-                          "topic", "received_at", "receivedAt"}
+            timestamp = int(payload.get("received_at") or time.time())
         
         # Handle DHT22 sensor data specifically (temperature and humidity)
         # Do this BEFORE extracting sensor_data to ensure proper handling
@@ -238,58 +466,38 @@ async def handle_mqtt_message(topic: str, payload: dict):
                         temp_val = payload.get("temperature_c")
                         sensor_data["temperature_c"] = float(temp_val) if temp_val is not None else 0.0
                     except (ValueError, TypeError) as e:
-                        print(f"   ⚠️ Error parsing temperature_c: {e}, value: {payload.get('temperature_c')}")
+                        logger.warning("⚠️ Error parsing temperature_c: %s, value: %r", e, payload.get("temperature_c"))
                         sensor_data["temperature_c"] = 0.0
                 if "humidity_percent" in payload:
                     try:
                         hum_val = payload.get("humidity_percent")
                         sensor_data["humidity_percent"] = float(hum_val) if hum_val is not None else 0.0
                     except (ValueError, TypeError) as e:
-                        print(f"   ⚠️ Error parsing humidity_percent: {e}, value: {payload.get('humidity_percent')}")
+                        logger.warning("⚠️ Error parsing humidity_percent: %s, value: %r", e, payload.get("humidity_percent"))
                         sensor_data["humidity_percent"] = 0.0
-                print(f"   🌡️ DHT22 data extracted: temp={sensor_data.get('temperature_c')}°C, humidity={sensor_data.get('humidity_percent')}%")
             elif "value" in payload:
                 # Fallback for primitive payloads
-                sensor_data = {"value": payload.get("value")}
-                print(f"   ⚠️ DHT22 using fallback value: {payload.get('value')}")
+                sensor_data = coerce_primitive(sensor_type, payload["value"])
+                logger.debug("⚠️ DHT22 using fallback value: %r", payload.get("value"))
             else:
                 # If no DHT22 data found, try to extract from sensor_data dict
                 # Sometimes the data might be nested
-                temp_data = {k: v for k, v in payload.items() if k not in metadata_fields}
+                temp_data = {k: v for k, v in payload.items() if k not in _METADATA_FIELDS}
                 if temp_data:
                     sensor_data = temp_data
-                    print(f"   ℹ️ DHT22 using extracted sensor_data: {sensor_data}")
+                    logger.debug("ℹ️ DHT22 using extracted sensor_data: %s", sensor_data)
                 else:
                     # Last resort: log warning
-                    print(f"   ⚠️ WARNING: DHT22 payload missing temperature_c and humidity_percent fields")
-                    print(f"   Payload keys: {list(payload.keys())}")
-                    print(f"   Full payload: {payload}")
+                    logger.warning("⚠️ DHT22 payload missing temperature_c and humidity_percent fields: %s", payload)
                     sensor_data = {"error": "missing_temperature_humidity_data"}
         else:
-            # For non-DHT22 sensors, extract sensor data normally
-            sensor_data = {k: v for k, v in payload.items() if k not in metadata_fields}
+            # For non-DHT22 sensors, extract sensor data in a single pass
+            sensor_data = {k: v for k, v in payload.items() if k not in _METADATA_FIELDS}
             
-            # If sensor_data is empty or only has "value"/"raw" (from primitive conversion),
+            # Primitive payloads (like "1" or "25.5") arrive as only "value"/"raw";
             # create proper sensor data structure for other sensors
-            if not sensor_data or (len(sensor_data) <= 2 and "value" in payload):
-                # For primitive payloads (like "1" or "25.5"), use the value
-                if "value" in payload:
-                    # Create sensor-specific data structure
-                    if sensor_type == "pir":
-                        sensor_data = {"motion_detected": bool(payload.get("value") == "1" or payload.get("value") == 1)}
-                    elif sensor_type == "ultrasonic":
-                        try:
-                            distance = float(payload.get("value", 0))
-                            sensor_data = {"distance_cm": distance}
-                        except:
-                            sensor_data = {"distance_cm": 0.0}
-                    else:
-                        sensor_data = {"value": payload.get("value")}
-                elif not sensor_data:
-                    # Use entire payload as data, removing metadata
-                    sensor_data = payload.copy()
-                    for key in metadata_fields:
-                        sensor_data.pop(key, None)
+            if "value" in payload and len(sensor_data) <= 2:
+                sensor_data = coerce_primitive(sensor_type, payload["value"])
         
         # Prepare data for database insertion
         db_reading = {
@@ -302,30 +510,31 @@ async def handle_mqtt_message(topic: str, payload: dict):
         }
         
         # Store sensor reading in database (real-time storage)
-        print(f"💾 Attempting to store reading: device_id={device_id}, sensor_type={sensor_type}, topic={topic}")
-        if sensor_type == "dht22":
-            print(f"   🌡️ DHT22 sensor_data before storage: {sensor_data}")
-            print(f"   🌡️ DHT22 payload keys: {list(payload.keys())}")
-            print(f"   🌡️ DHT22 payload values: temperature_c={payload.get('temperature_c')}, humidity_percent={payload.get('humidity_percent')}")
         try:
-            reading_id = await insert_sensor_reading(db_reading)
-            print(f"✅ SUCCESS: Stored sensor reading #{reading_id} from {device_id} ({sensor_type}) on topic '{topic}' at {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"   Device ID: {device_id}, Sensor Type: {sensor_type}, Location: {location}")
-            print(f"   Data: {sensor_data}")
-            if sensor_type == "dht22":
-                print(f"   🌡️ DHT22 stored with: temp={sensor_data.get('temperature_c')}°C, humidity={sensor_data.get('humidity_percent')}%")
+            if reading_queue is not None:
+                enqueue_sensor_reading(db_reading)
+            else:
+                await insert_sensor_reading(db_reading)
+            if sensor_type in ROOM_SENSOR_TYPES:
+                recent_room_readings.append(db_reading)
+            logger.debug(
+                "💾 Stored reading from %s (%s) on topic '%s', location=%s: %s",
+                device_id, sensor_type, topic, location, sensor_data
+            )
             
             # Evaluate alerts after storing reading
             global alert_engine
             if alert_engine:
                 try:
-                    # Get recent readings for trend analysis
-                    recent_readings = await get_recent_sensor_readings(
-                        device_id=device_id,
-                        sensor_type=sensor_type,
-                        minutes=10,
-                        limit=20
-                    )
+                    # Stored readings only seed the engine's ring buffer the first time a sensor is seen
+                    recent_readings = None
+                    if alert_engine.needs_recent_readings(device_id, sensor_type):
+                        recent_readings = await get_recent_sensor_readings(
+                            device_id=device_id,
+                            sensor_type=sensor_type,
+                            minutes=10,
+                            limit=20
+                        )
                     
                     # Evaluate alerts
                     alerts = alert_engine.evaluate_sensor_reading(
@@ -338,63 +547,144 @@ async def handle_mqtt_message(topic: str, payload: dict):
                     
                     # Store alerts in database and broadcast via WebSocket
                     for alert in alerts:
-                        alert_id = await insert_alert(alert)
-                        print(f"🚨 ALERT #{alert_id}: {alert.get('message')} (Severity: {alert.get('severity')})")
+                        alert_data = alert.to_dict()
+                        alert_id = await insert_alert(alert_data)
+                        logger.info("🚨 ALERT #%s: %s (Severity: %s)", alert_id, alert.message, alert.severity)
                         
                         # Broadcast alert via WebSocket
-                        await broadcast_alert(alert)
+                        await broadcast_alert(alert_data)
                         
-                except Exception as alert_error:
-                    print(f"⚠️ Alert evaluation error: {alert_error}")
-                    import traceback
-                    traceback.print_exc()
+                except Exception:
+                    logger.exception("⚠️ Alert evaluation error")
                     
         except Exception as db_error:
-            print(f"❌ DATABASE ERROR: Failed to store reading: {db_error}")
-            import traceback
-            traceback.print_exc()
+            logger.error("❌ DATABASE ERROR: Failed to store reading: %s", db_error)
             raise  # Re-raise to be caught by outer exception handler
         
         # Check for fall detection if from wearable (legacy support)
-        if "wearable" in topic or "MICROBIT" in device_id.upper():
-            await process_fall_detection(payload)
-        
-        # Broadcast to WebSocket connections for real-time frontend updates
-        # Send separate message types for each sensor for easier frontend filtering
-        websocket_message = {
-            "type": f"sensor_{sensor_type}",  # e.g., "sensor_pir", "sensor_ultrasonic", "sensor_dht22"
-            "sensor_type": sensor_type,  # Keep for backward compatibility
-            "topic": topic,
-            "device_id": device_id,
-            "timestamp": timestamp,
-            "data": sensor_data,
-            "location": location
-        }
-        await broadcast_to_websockets(websocket_message)
+        if is_wearable_source(topic, device_id):
+            if fall_queue is not None:
+                enqueue_fall_candidate(payload)
+            else:
+                await process_fall_detection(payload)
         
-        # Also send generic sensor_data message for backward compatibility
-        await broadcast_to_websockets({
-            "type": "sensor_data",
-            "topic": topic,
-            "device_id": device_id,
-            "sensor_type": sensor_type,
-            "timestamp": timestamp,
-            "data": sensor_data,
-            "location": location
-        })
+        # Queue for the next sensor_batch WebSocket broadcast
+        # Each item keeps the per-sensor type for easier frontend filtering
+        if has_websocket_audience():
+            ws_outbox.append({
+                "type": f"sensor_{sensor_type}",  # e.g., "sensor_pir", "sensor_ultrasonic", "sensor_dht22"
+                "sensor_type": sensor_type,
+                "topic": topic,
+                "device_id": device_id,
+                "timestamp": timestamp,
+                "data": sensor_data,
+                "location": location
+            })
         
-    except Exception as e:
-        import traceback
-        print(f"❌ CRITICAL ERROR handling MQTT message from topic '{topic}': {e}")
-        print(f"   Error type: {type(e).__name__}")
-        print(f"   Payload type: {type(payload)}")
-        print(f"   Payload: {payload}")
-        print(f"   Full traceback:")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("❌ CRITICAL ERROR handling MQTT message from topic '%s', payload: %r", topic, payload)
         # Re-raise to ensure it's logged, but don't stop the MQTT client
         # The error will be caught by the future callback in mqtt_client
 
-async def process_fall_detection(payload: dict):
+async def sensor_reading_writer(queue: asyncio.Queue):
+    """Write queued sensor readings to the database in batches until a None sentinel arrives"""
+    loop = asyncio.get_running_loop()
+    batch_size = READING_BATCH_MIN
+    last_prune = loop.time()
+    running = True
+    while running:
+        item = await queue.get()
+        if item is None:
+            break
+        batch = [item]
+        
+        # Fill the batch until it is full or the flush interval has passed
+        deadline = loop.time() + READING_FLUSH_INTERVAL
+        while len(batch) < batch_size:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+            if item is None:
+                running = False
+                break
+            batch.append(item)
+        
+        try:
+            await insert_sensor_readings(batch)
+            logger.debug("💾 Stored batch of %d sensor readings", len(batch))
+        except Exception as e:
+            logger.error("❌ DATABASE ERROR: Failed to store batch of %d readings: %s", len(batch), e)
+        
+        if SENSOR_READINGS_MAX_ROWS and loop.time() - last_prune >= READING_PRUNE_INTERVAL:
+            last_prune = loop.time()
+            try:
+                deleted = await prune_sensor_readings(SENSOR_READINGS_MAX_ROWS)
+                if deleted:
+                    logger.info("🧹 Pruned %d old sensor readings", deleted)
+            except Exception as e:
+                logger.warning("⚠️ Failed to prune sensor readings: %s", e)
+        
+        # Adapt the batch size to the backlog
+        if queue.qsize() > batch_size:
+            batch_size = min(batch_size * 2, READING_BATCH_MAX)
+        elif len(batch) < batch_size // 2:
+            batch_size = max(batch_size // 2, READING_BATCH_MIN)
+
+def enqueue_sensor_reading(db_reading: dict):
+    """Queue a reading for the batched writer without waiting, dropping the oldest queued one when full"""
+    global dropped_readings
+    try:
+        reading_queue.put_nowait(db_reading)
+        return
+    except asyncio.QueueFull:
+        pass
+    
+    dropped = reading_queue.get_nowait()
+    # Never drop the shutdown sentinel; the new reading is lost instead
+    reading_queue.put_nowait(db_reading if dropped is not None else None)
+    dropped_readings += 1
+    if dropped_readings % 1000 == 1:
+        logger.warning("⚠️ Sensor reading queue full, %d readings dropped so far", dropped_readings)
+
+def enqueue_fall_candidate(payload: dict):
+    """Queue a wearable payload for the fall detection workers, dropping the oldest one when full"""
+    try:
+        fall_queue.put_nowait(payload)
+    except asyncio.QueueFull:
+        dropped = fall_queue.get_nowait()
+        fall_queue.task_done()
+        fall_queue.put_nowait(payload)
+        logger.warning("⚠️ Fall detection queue full, dropped oldest payload from %s", dropped.get("device_id", "unknown"))
+
+async def fall_detection_worker(queue: asyncio.Queue):
+    """Drain queued wearable payloads in batches and run fall detection on each"""
+    while True:
+        batch = [await queue.get()]
+        while len(batch) < FALL_BATCH_SIZE:
+            try:
+                batch.append(queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        
+        try:
+            # One room sensor query serves the whole batch
+            room_data = await fetch_recent_room_sensor_data()
+            for payload in batch:
+                await process_fall_detection(payload, room_data)
+        except Exception as e:
+            logger.error("Error in fall detection worker: %s", e)
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+async def process_fall_detection(payload: dict, room_data: Optional[list] = None):
     """Process potential fall detection"""
     global fall_detector, alert_manager
     
@@ -403,13 +693,19 @@ async def process_fall_detection(payload: dict):
     
     try:
         # Get room sensor data for verification
-        room_data = await fetch_recent_room_sensor_data()
+        if room_data is None:
+            room_data = await fetch_recent_room_sensor_data()
         
-        # Run fall detection algorithm
-        result = await fall_detector.detect_fall(
-            wearable_data=payload,
-            room_sensor_data=room_data
-        )
+        # Run fall detection algorithm in the inference thread so the event loop keeps serving I/O
+        if inference_pool is not None:
+            result = await asyncio.get_running_loop().run_in_executor(
+                inference_pool, fall_detector.detect_fall_sync, payload, room_data
+            )
+        else:
+            result = await fall_detector.detect_fall(
+                wearable_data=payload,
+                room_sensor_data=room_data
+            )
         
         if result["fall_detected"]:
             # Create fall event
@@ -427,29 +723,43 @@ async def process_fall_detection(payload: dict):
             
             # Save to database
             event_id = await insert_fall_event(fall_event)
+            await invalidate_shared_statistics()
             
             # Trigger alerts
             await alert_manager.send_fall_alert(fall_event, event_id)
             
             # Broadcast to WebSocket
-            await broadcast_to_websockets({
-                "type": "fall_event",
-                "event": fall_event,
-                "event_id": event_id
-            })
+            if has_websocket_audience():
+                await broadcast_to_websockets({
+                    "type": "fall_event",
+                    "event": fall_event,
+                    "event_id": event_id
+                })
             
     except Exception as e:
-        print(f"Error processing fall detection: {e}")
+        logger.error("Error processing fall detection: %s", e)
 
 async def fetch_recent_room_sensor_data():
-    """Get recent room sensor readings for verification"""
-    # Convert 30 seconds to minutes (approximately 0.5 minutes)
-    recent_readings = await get_recent_room_sensor_data(minutes=1, limit=20)
-    return recent_readings
+    """Get recent room sensor readings for verification, newest first"""
+    if not recent_room_readings:
+        # Nothing received since startup; older readings may still be in the database
+        return await get_recent_room_sensor_data(minutes=1, limit=ROOM_DATA_LIMIT)
+    
+    # Same window and ordering as get_recent_room_sensor_data, without a database read
+    cutoff = int(time.time()) - ROOM_DATA_WINDOW
+    recent = [reading for reading in recent_room_readings if reading["timestamp"] >= cutoff]
+    recent.sort(key=lambda reading: reading["timestamp"], reverse=True)
+    return recent[:ROOM_DATA_LIMIT]
 
 # ==================== WebSocket Manager ====================
+def has_websocket_audience() -> bool:
+    """Whether a broadcast would reach anyone: local clients, or API workers via Redis"""
+    return event_publisher is not None or bool(websocket_connections)
+
 async def broadcast_alert(alert: dict):
     """Broadcast alert to all WebSocket connections"""
+    if not has_websocket_audience():
+        return
     websocket_message = {
         "type": "alert",
         "alert": alert
@@ -457,17 +767,118 @@ async def broadcast_alert(alert: dict):
     await broadcast_to_websockets(websocket_message)
 
 async def broadcast_to_websockets(message: dict):
-    """Broadcast message to all connected WebSocket clients"""
-    disconnected = []
-    for connection in websocket_connections:
+    """Broadcast message to all connected WebSocket clients (through Redis when running as the ingestor)"""
+    if not has_websocket_audience():
+        return
+    
+    # Serialize once; the same text goes to every client or to the API workers
+    if orjson is not None:
+        text = orjson.dumps(message, default=str, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    else:
+        text = json.dumps(message, default=str)
+    
+    if event_publisher is not None:
+        try:
+            await event_publisher.publish(SENSOR_EVENTS_CHANNEL, text)
+        except Exception as e:
+            logger.error("Error publishing to Redis: %s", e)
+        return
+    await send_to_websockets(text)
+
+async def send_to_websockets(text: str):
+    """Send an already serialized frame to every local client concurrently"""
+    if not websocket_connections:
+        return
+    
+    connections = list(websocket_connections)
+    results = await asyncio.gather(
+        *(asyncio.wait_for(connection.send_text(text), WEBSOCKET_SEND_TIMEOUT) for connection in connections),
+        return_exceptions=True
+    )
+    
+    # Remove disconnected or stalled clients
+    dropped = [connection for connection, result in zip(connections, results) if isinstance(result, Exception)]
+    if dropped:
+        for connection in dropped:
+            websocket_connections.discard(connection)
+        await asyncio.gather(*(close_websocket(connection) for connection in dropped))
+
+async def relay_redis_events(client):
+    """Forward frames published by the ingestor to this worker's WebSocket clients"""
+    while True:
         try:
-            await connection.send_json(message)
-        except:
-            disconnected.append(connection)
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(SENSOR_EVENTS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        await send_to_websockets(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("⚠️  Redis relay error: %s. Resubscribing in 5s", e)
+            await asyncio.sleep(5)
+
+async def close_websocket(websocket: WebSocket):
+    """Close a dropped client without letting a dead socket raise or hang"""
+    try:
+        await asyncio.wait_for(websocket.close(), WEBSOCKET_SEND_TIMEOUT)
+    except Exception:
+        pass
+
+async def websocket_flusher():
+    """Broadcast queued sensor messages as one sensor_batch frame per flush window"""
+    global ws_outbox
+    interval = WS_FLUSH_INTERVAL
+    while True:
+        await asyncio.sleep(interval)
+        if not ws_outbox:
+            continue
+        
+        items, ws_outbox = ws_outbox, []
+        if not has_websocket_audience():
+            # Every client left since these were queued
+            continue
+        try:
+            await broadcast_to_websockets({"type": "sensor_batch", "items": items})
+        except Exception as e:
+            logger.error("Error broadcasting sensor batch: %s", e)
+        
+        # Low traffic flushes sooner for latency, heavy traffic waits longer for bigger batches
+        if len(items) > WS_BATCH_TARGET:
+            interval = min(interval * 1.5, WS_FLUSH_MAX_INTERVAL)
+        else:
+            interval = max(interval / 1.5, WS_FLUSH_MIN_INTERVAL)
+
+# ==================== Response Cache ====================
+def async_ttl_cache(ttl: float, maxsize: int = 1):
+    """
+    Cache the results of a coroutine function for ttl seconds, keyed by its positional arguments
     
-    # Remove disconnected clients
-    for conn in disconnected:
-        websocket_connections.remove(conn)
+    Concurrent callers during a refresh share one call; failures are not cached.
+    At most maxsize keys are kept, evicting the least recently refreshed; cache_clear() drops them all.
+    """
+    def decorator(func):
+        cache: Dict[tuple, tuple] = {}  # args -> (expires_at, task)
+        
+        @wraps(func)
+        async def wrapper(*args):
+            now = time.monotonic()
+            entry = cache.get(args)
+            if entry is None or now >= entry[0]:
+                cache.pop(args, None)
+                if len(cache) >= maxsize:
+                    del cache[next(iter(cache))]
+                entry = cache[args] = (now + ttl, asyncio.ensure_future(func(*args)))
+            try:
+                # Shielded so a disconnecting client cannot cancel the shared call
+                return await asyncio.shield(entry[1])
+            except Exception:
+                if cache.get(args) is entry:
+                    del cache[args]
+                raise
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
 
 # ==================== API Endpoints ====================
 
@@ -503,15 +914,21 @@ async def get_mqtt_stats():
     stats["mqtt_connected"] = mqtt_client.is_connected()
     stats["broker_host"] = mqtt_client.broker_host
     stats["broker_port"] = mqtt_client.broker_port
+    stats["dropped_readings"] = dropped_readings
     stats["timestamp"] = datetime.utcnow().isoformat()
     
     return stats
 
 @app.get("/api/devices", response_model=List[DeviceStatus])
-async def get_devices_endpoint(current_user: dict = Depends(require_viewer_or_above)):
+async def get_devices_endpoint(response: Response, current_user: dict = Depends(require_viewer_or_above)):
     """Get all device statuses (requires authentication)"""
-    devices = await db_get_devices()
-    return devices
+    response.headers["Cache-Control"] = "private, max-age=5"
+    return await cached_devices()
+
+@async_ttl_cache(DEVICES_TTL)
+async def cached_devices():
+    """Device list shared by polls within DEVICES_TTL"""
+    return await db_get_devices()
 
 @app.get("/api/sensors")
 async def get_sensors_endpoint(
@@ -573,26 +990,30 @@ async def get_sensor_readings_endpoint(
 ):
     """Get sensor readings with optional filters"""
     try:
-        print(f"📊 API: Fetching sensor readings - device_id={device_id}, sensor_type={sensor_type}, limit={limit}")
-        readings = await db_get_sensor_readings(
-            device_id=device_id,
-            sensor_type=sensor_type,
-            limit=limit
-        )
-        print(f"📊 API: Returning {len(readings)} sensor readings")
+        logger.debug("📊 API: Fetching sensor readings - device_id=%s, sensor_type=%s, limit=%s", device_id, sensor_type, limit)
+        readings = await fetch_sensor_readings(device_id, sensor_type, limit)
+        logger.debug("📊 API: Returning %d sensor readings", len(readings))
         if len(readings) == 0:
-            print(f"⚠️  API: No sensor readings found in database. Check if MQTT messages are being stored.")
+            logger.debug("⚠️  API: No sensor readings found in database. Check if MQTT messages are being stored.")
         return readings
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"❌ Error fetching sensor readings: {e}")
-        print(f"Traceback: {error_details}")
+        logger.exception("❌ Error fetching sensor readings")
         raise HTTPException(
             status_code=500, 
             detail=f"Error fetching sensor readings: {str(e)}. Check server logs for details."
         )
 
+async def fetch_sensor_readings(device_id: Optional[str], sensor_type: Optional[str], limit: int):
+    """Get sensor readings, sharing dashboard-sized queries for READINGS_TTL"""
+    if limit <= READINGS_CACHE_MAX_LIMIT:
+        return await cached_sensor_readings(device_id, sensor_type, limit)
+    return await db_get_sensor_readings(device_id=device_id, sensor_type=sensor_type, limit=limit)
+
+@async_ttl_cache(READINGS_TTL, maxsize=64)
+async def cached_sensor_readings(device_id: Optional[str], sensor_type: Optional[str], limit: int):
+    """Sensor readings query shared by identical requests within READINGS_TTL"""
+    return await db_get_sensor_readings(device_id=device_id, sensor_type=sensor_type, limit=limit)
+
 # ==================== Separate Sensor Endpoints ====================
 
 @app.get("/api/sensors/pir")
@@ -603,19 +1024,12 @@ async def get_pir_sensor_readings(
 ):
     """Get PIR motion sensor readings (requires authentication)"""
     try:
-        print(f"📊 API: Fetching PIR sensor readings - device_id={device_id}, limit={limit}")
-        readings = await db_get_sensor_readings(
-            device_id=device_id,
-            sensor_type="pir",
-            limit=limit
-        )
-        print(f"📊 API: Returning {len(readings)} PIR sensor readings")
+        logger.debug("📊 API: Fetching PIR sensor readings - device_id=%s, limit=%s", device_id, limit)
+        readings = await fetch_sensor_readings(device_id, "pir", limit)
+        logger.debug("📊 API: Returning %d PIR sensor readings", len(readings))
         return readings
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"Error fetching PIR sensor readings: {e}")
-        print(f"Traceback: {error_details}")
+        logger.exception("Error fetching PIR sensor readings")
         raise HTTPException(
             status_code=500, 
             detail=f"Error fetching PIR sensor readings: {str(e)}. Check server logs for details."
@@ -629,19 +1043,12 @@ async def get_ultrasonic_sensor_readings(
 ):
     """Get Ultrasonic distance sensor readings"""
     try:
-        print(f"📊 API: Fetching Ultrasonic sensor readings - device_id={device_id}, limit={limit}")
-        readings = await db_get_sensor_readings(
-            device_id=device_id,
-            sensor_type="ultrasonic",
-            limit=limit
-        )
-        print(f"📊 API: Returning {len(readings)} Ultrasonic sensor readings")
+        logger.debug("📊 API: Fetching Ultrasonic sensor readings - device_id=%s, limit=%s", device_id, limit)
+        readings = await fetch_sensor_readings(device_id, "ultrasonic", limit)
+        logger.debug("📊 API: Returning %d Ultrasonic sensor readings", len(readings))
         return readings
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"Error fetching Ultrasonic sensor readings: {e}")
-        print(f"Traceback: {error_details}")
+        logger.exception("Error fetching Ultrasonic sensor readings")
         raise HTTPException(
             status_code=500, 
             detail=f"Error fetching Ultrasonic sensor readings: {str(e)}. Check server logs for details."
@@ -655,23 +1062,14 @@ async def get_dht22_sensor_readings(
 ):
     """Get DHT22 temperature/humidity sensor readings"""
     try:
-        print(f"📊 API: Fetching DHT22 sensor readings - device_id={device_id}, limit={limit}")
-        readings = await db_get_sensor_readings(
-            device_id=device_id,
-            sensor_type="dht22",
-            limit=limit
-        )
-        print(f"📊 API: Returning {len(readings)} DHT22 sensor readings")
-        if len(readings) > 0:
-            print(f"   🌡️ Sample DHT22 reading: {readings[0]}")
-            if readings[0].get("data"):
-                print(f"   🌡️ Sample data field: {readings[0]['data']}")
+        logger.debug("📊 API: Fetching DHT22 sensor readings - device_id=%s, limit=%s", device_id, limit)
+        readings = await fetch_sensor_readings(device_id, "dht22", limit)
+        logger.debug("📊 API: Returning %d DHT22 sensor readings", len(readings))
+        if readings:
+            logger.debug("🌡️ Sample DHT22 reading: %s", readings[0])
         return readings
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"Error fetching DHT22 sensor readings: {e}")
-        print(f"Traceback: {error_details}")
+        logger.exception("Error fetching DHT22 sensor readings")
         raise HTTPException(
             status_code=500, 
             detail=f"Error fetching DHT22 sensor readings: {str(e)}. Check server logs for details."
@@ -687,13 +1085,19 @@ async def get_fall_events(
     events = await get_fall_events(user_id=user_id, limit=limit)
     return events
 
+def parse_event_id(event_id: str) -> int:
+    """Validate a fall event ID path parameter before it reaches the database"""
+    if not EVENT_ID_PATTERN.fullmatch(event_id):
+        raise HTTPException(status_code=400, detail="Invalid event ID")
+    return int(event_id)
+
 @app.get("/api/fall-events/{event_id}")
 async def get_fall_event_endpoint(
     event_id: str,
     current_user: dict = Depends(require_viewer_or_above)
 ):
     """Get specific fall event (requires authentication)"""
-    event = await get_fall_event(event_id)
+    event = await get_fall_event(parse_event_id(event_id))
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
@@ -705,7 +1109,7 @@ async def acknowledge_fall_event_endpoint(
     current_user: dict = Depends(require_viewer_or_above)
 ):
     """Acknowledge a fall event (requires authentication)"""
-    result = await acknowledge_fall_event(event_id)
+    result = await acknowledge_fall_event(parse_event_id(event_id))
     
     if not result:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -715,21 +1119,72 @@ async def acknowledge_fall_event_endpoint(
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time updates"""
+    if len(websocket_connections) >= MAX_WEBSOCKET_CONNECTIONS:
+        # Reject before accepting so an overloaded Pi does not take on another broadcast target
+        await websocket.close(code=1013)
+        return
+    
     await websocket.accept()
-    websocket_connections.append(websocket)
+    websocket_connections.add(websocket)
     
     try:
         while True:
             # Keep connection alive and handle incoming messages
             data = await websocket.receive_text()
             # Echo back or process message
-            await websocket.send_json({"type": "ack", "message": "received"})
+            await websocket.send_text(WEBSOCKET_ACK_FRAME)
     except WebSocketDisconnect:
-        websocket_connections.remove(websocket)
+        pass
+    finally:
+        websocket_connections.discard(websocket)
 
 @app.get("/api/statistics")
-async def get_statistics(current_user: dict = Depends(require_viewer_or_above)):
+async def get_statistics(response: Response, current_user: dict = Depends(require_viewer_or_above)):
     """Get system statistics (requires authentication)"""
+    response.headers["Cache-Control"] = f"private, max-age={STATISTICS_TTL}"
+    if redis_client is not None:
+        return await shared_statistics()
+    return await cached_statistics()
+
+@async_ttl_cache(STATISTICS_TTL)
+async def cached_statistics():
+    """Dashboards poll /api/statistics; recount the tables at most once per STATISTICS_TTL"""
+    return await count_statistics()
+
+async def shared_statistics():
+    """
+    With several API workers, share one count per STATISTICS_TTL through Redis
+    
+    Not memoized locally, so invalidate_shared_statistics() from the ingestor reaches every worker.
+    Falls back to counting in SQLite while Redis is down.
+    """
+    try:
+        cached = await redis_client.get(STATISTICS_CACHE_KEY)
+        if cached:
+            return json.loads(cached)
+    except Exception as e:
+        logger.warning("Redis statistics cache unavailable: %s", e)
+        return await count_statistics()
+    
+    statistics = await count_statistics()
+    try:
+        await redis_client.set(STATISTICS_CACHE_KEY, json.dumps(statistics), ex=STATISTICS_TTL)
+    except Exception as e:
+        logger.warning("Could not cache statistics in Redis: %s", e)
+    return statistics
+
+async def invalidate_shared_statistics():
+    """Drop the cached statistics, locally and in Redis, so a new fall event shows up on the next poll"""
+    cached_statistics.cache_clear()
+    if redis_client is None:
+        return
+    try:
+        await redis_client.delete(STATISTICS_CACHE_KEY)
+    except Exception as e:
+        logger.warning("Could not invalidate cached statistics: %s", e)
+
+async def count_statistics() -> dict:
+    """Count fall events, sensor readings and active devices"""
     total_events = await count_fall_events()
     recent_events = await count_fall_events({
         "timestamp_gte": datetime.utcnow() - timedelta(days=7)
@@ -737,21 +1192,19 @@ async def get_statistics(current_user: dict = Depends(require_viewer_or_above)):
     total_readings = await count_sensor_readings()
     active_devices = await count_active_devices()
     
-    print(f"📊 Statistics: total_readings={total_readings}, active_devices={active_devices}")
+    logger.debug("📊 Statistics: total_readings=%s, active_devices=%s", total_readings, active_devices)
     
-    return {
+    statistics = {
         "total_fall_events": total_events,
         "recent_events_7d": recent_events,
         "total_sensor_readings": total_readings,
         "active_devices": active_devices
     }
+    return statistics
 
 @app.get("/api/debug/database")
 async def debug_database():
     """Debug endpoint to check database status"""
-    import os
-    from database.sqlite_db import DB_PATH
-    
     result = {
         "database_path": DB_PATH,
         "database_exists": os.path.exists(DB_PATH),
@@ -773,19 +1226,33 @@ async def debug_database():
 
 # ==================== Run Server ====================
 if __name__ == "__main__":
-    import os
-    from dotenv import load_dotenv
-    
-    load_dotenv()
-    
     host = os.getenv("API_HOST", "0.0.0.0")
     port = int(os.getenv("API_PORT", 8000))
+    # A Unix domain socket (e.g. /run/fall-detection/api.sock) replaces host/port behind a local reverse proxy
+    uds = os.getenv("API_UDS") or None
+    # The reloader adds a watcher process - only enable it for development
+    reload = os.getenv("API_RELOAD", "false").lower() in ("1", "true", "yes")
+    
+    # uvloop and httptools ship with uvicorn[standard]; uvloop is not available on Windows
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    
+    # Extra workers need BACKEND_ROLE=api so only the ingestor process subscribes to MQTT
+    workers = int(os.getenv("API_WORKERS", 1))
+    if workers > 1 and BACKEND_ROLE != "api":
+        print(f"⚠️  API_WORKERS={workers} requires BACKEND_ROLE=api with a separate ingestor; using 1 worker")
+        workers = 1
     
     uvicorn.run(
         "main:app",
         host=host,
         port=port,
-        reload=True,
+        uds=uds,
+        reload=reload,
+        loop=loop,
+        http=http,
+        ws="websockets",
+        workers=workers,
         log_level="info"
     )
 
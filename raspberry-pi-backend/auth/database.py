@@ -3,6 +3,7 @@ Database functions for user authentication
 """
 
 import aiosqlite
+import asyncio
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from auth.utils import hash_password
@@ -39,7 +40,7 @@ async def create_user(username: str, email: str, password: str, role: str = "vie
             raise ValueError(f"Email '{email}' already exists")
         
         # Hash password
-        hashed_password = hash_password(password)
+        hashed_password = await asyncio.to_thread(hash_password, password)
         
         # Insert user
         cursor = await db.execute("""
@@ -132,7 +133,7 @@ async def update_user(user_id: int, email: Optional[str] = None, role: Optional[
             params.append(int(is_active))
         
         if password is not None:
-            hashed_password = hash_password(password)
+            hashed_password = await asyncio.to_thread(hash_password, password)
             updates.append("hashed_password = ?")
             params.append(hashed_password)
         
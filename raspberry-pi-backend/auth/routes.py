@@ -2,6 +2,7 @@
 Authentication routes
 """
 
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
@@ -57,7 +58,8 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if not verify_password(form_data.password, user["hashed_password"]):
+    # bcrypt is deliberately slow (hundreds of ms on a Pi); keep it off the event loop
+    if not await asyncio.to_thread(verify_password, form_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
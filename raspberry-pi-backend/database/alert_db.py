@@ -3,14 +3,22 @@ Database functions for alerts
 """
 
 import aiosqlite
-import json
+import time
 from typing import List, Dict, Optional, Any
 from datetime import datetime
 import os
+from database.sqlite_db import apply_read_pragmas, apply_write_pragmas, dumps_json, loads_json
 
 # Database path (same as main database)
 DB_PATH = os.path.join(os.path.dirname(__file__), "..", "fall_detection.db")
 
+async def get_alerts_version() -> int:
+    """Return the alert change counter maintained by the alerts_version triggers (see init_database)"""
+    async with aiosqlite.connect(DB_PATH) as db:
+        cursor = await db.execute("SELECT version FROM alerts_version WHERE id = 1")
+        row = await cursor.fetchone()
+        return row[0] if row else 0
+
 def dict_factory(cursor, row):
     """Convert database row to dictionary"""
     return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
@@ -19,12 +27,13 @@ async def insert_alert(alert_data: Dict[str, Any]) -> int:
     """Insert a new alert into the database"""
     async with aiosqlite.connect(DB_PATH) as db:
         db.row_factory = dict_factory
+        await apply_write_pragmas(db)
         
         device_id = alert_data.get("device_id", "unknown")
         alert_type = alert_data.get("alert_type", "unknown")
         message = alert_data.get("message", "")
         severity = alert_data.get("severity", "low")
-        sensor_values = json.dumps(alert_data.get("sensor_values", {}))
+        sensor_values = dumps_json(alert_data.get("sensor_values", {}))
         triggered_at = alert_data.get("triggered_at", datetime.utcnow().isoformat())
         
         cursor = await db.execute("""
@@ -72,12 +81,13 @@ async def get_alerts(
         cursor = await db.execute(query, params)
         rows = await cursor.fetchall()
         
-        # Parse JSON sensor_values
+        # Parse JSON sensor_values and return rows in AlertResponse shape
         for row in rows:
+            row["acknowledged"] = bool(row["acknowledged"])
             if row.get("sensor_values"):
                 try:
                     if isinstance(row["sensor_values"], str):
-                        row["sensor_values"] = json.loads(row["sensor_values"])
+                        row["sensor_values"] = loads_json(row["sensor_values"])
                 except:
                     row["sensor_values"] = {}
         
@@ -99,10 +109,12 @@ async def get_alert_by_id(alert_id: int) -> Optional[Dict[str, Any]]:
         cursor = await db.execute("SELECT * FROM alerts WHERE id = ?", (alert_id,))
         row = await cursor.fetchone()
         
+        if row:
+            row["acknowledged"] = bool(row["acknowledged"])
         if row and row.get("sensor_values"):
             try:
                 if isinstance(row["sensor_values"], str):
-                    row["sensor_values"] = json.loads(row["sensor_values"])
+                    row["sensor_values"] = loads_json(row["sensor_values"])
             except:
                 row["sensor_values"] = {}
         
@@ -143,6 +155,7 @@ async def count_alerts(
 ) -> int:
     """Count alerts with optional filters"""
     async with aiosqlite.connect(DB_PATH) as db:
+        await apply_read_pragmas(db)
         db.row_factory = dict_factory
         
         query = "SELECT COUNT(*) as count FROM alerts WHERE 1=1"
@@ -168,6 +181,40 @@ async def count_alerts(
         result = await cursor.fetchone()
         return result["count"] if result else 0
 
+async def get_alert_stats() -> Dict[str, Any]:
+    """
+    Count alerts by severity, type and acknowledgement in a single grouped query
+    
+    Returns:
+        Dict with total, unacknowledged, by_severity and by_type counts
+    """
+    async with aiosqlite.connect(DB_PATH) as db:
+        await apply_read_pragmas(db)
+        cursor = await db.execute("""
+            SELECT severity, alert_type, acknowledged, COUNT(*)
+            FROM alerts
+            GROUP BY severity, alert_type, acknowledged
+        """)
+        rows = await cursor.fetchall()
+    
+    total = 0
+    unacknowledged = 0
+    by_severity: Dict[str, int] = {}
+    by_type: Dict[str, int] = {}
+    for severity, alert_type, acknowledged, count in rows:
+        total += count
+        if acknowledged == 0:
+            unacknowledged += count
+        by_severity[severity] = by_severity.get(severity, 0) + count
+        by_type[alert_type] = by_type.get(alert_type, 0) + count
+    
+    return {
+        "total": total,
+        "unacknowledged": unacknowledged,
+        "by_severity": by_severity,
+        "by_type": by_type
+    }
+
 async def get_recent_sensor_readings(
     device_id: str,
     sensor_type: str,
@@ -179,12 +226,11 @@ async def get_recent_sensor_readings(
         db.row_factory = dict_factory
         
         # Calculate timestamp threshold
-        from datetime import datetime, timedelta
-        threshold_time = datetime.utcnow() - timedelta(minutes=minutes)
-        threshold_timestamp = int(threshold_time.timestamp())
+        threshold_timestamp = int(time.time()) - minutes * 60
         
+        # Only the columns the alert engine reads
         cursor = await db.execute("""
-            SELECT * FROM sensor_readings
+            SELECT sensor_type, timestamp, data FROM sensor_readings
             WHERE device_id = ? 
             AND sensor_type = ?
             AND timestamp >= ?
@@ -199,7 +245,7 @@ async def get_recent_sensor_readings(
             if row.get("data"):
                 try:
                     if isinstance(row["data"], str):
-                        row["data"] = json.loads(row["data"])
+                        row["data"] = loads_json(row["data"])
                 except:
                     row["data"] = {}
         
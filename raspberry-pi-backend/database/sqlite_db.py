@@ -4,23 +4,74 @@ Asynchronous SQLite operations for the Fall Detection System
 """
 
 import aiosqlite
+import asyncio
 import json
+import time
+import traceback
 from typing import List, Dict, Optional, Any
 from datetime import datetime, timedelta
 import os
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Database file path
 DB_PATH = os.path.join(os.path.dirname(__file__), "..", "fall_detection.db")
 
+# Memory-mapped I/O size for scan-heavy reads (see apply_read_pragmas)
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Alert log rows are queued and written in batches by a background task
+ALERT_LOG_BATCH_SIZE = 64
+ALERT_LOG_FLUSH_INTERVAL = 0.05  # seconds
+_alert_log_queue: Optional[asyncio.Queue] = None
+_alert_log_writer: Optional[asyncio.Task] = None
+
 def dict_factory(cursor, row):
     """Convert database row to dictionary"""
     return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
 
+def dumps_json(value: Any) -> str:
+    """Serialize to JSON text, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(value)
+
+def loads_json(text: str) -> Any:
+    """Parse JSON text, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+async def apply_write_pragmas(db: aiosqlite.Connection):
+    """
+    Relax per-connection durability for write-heavy connections
+    
+    With WAL (enabled in init_database) and synchronous=NORMAL, commits append to the WAL
+    without an fsync; the WAL is synced at checkpoints, so a power cut can lose only the
+    last few commits, never corrupt the database.
+    """
+    await db.execute("PRAGMA synchronous=NORMAL")
+    await db.execute("PRAGMA temp_store=MEMORY")
+
+async def apply_read_pragmas(db: aiosqlite.Connection):
+    """
+    Memory-map the database for connections that scan many rows
+    
+    Connections are opened per call, so their private page cache starts cold; with mmap
+    they read pages straight from the OS page cache shared by every connection.
+    """
+    await db.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+
 async def init_database():
     """Initialize database and create tables if they don't exist"""
     async with aiosqlite.connect(DB_PATH) as db:
         db.row_factory = dict_factory
         
+        # Write-ahead logging lets readers run alongside the writer; the mode persists in the file
+        await db.execute("PRAGMA journal_mode=WAL")
+        
         # Sensor readings table
         await db.execute("""
             CREATE TABLE IF NOT EXISTS sensor_readings (
@@ -156,8 +207,31 @@ async def init_database():
         await db.execute("CREATE INDEX IF NOT EXISTS idx_alerts_triggered ON alerts(triggered_at)")
         await db.execute("CREATE INDEX IF NOT EXISTS idx_alerts_acknowledged ON alerts(acknowledged)")
         
+        # Alert change counter for ETags, bumped by triggers so writes from any connection or process count
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS alerts_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        """)
+        # Seeded with the creation time so a recreated database never repeats an ETag a client still holds
+        await db.execute(
+            "INSERT OR IGNORE INTO alerts_version (id, version) VALUES (1, ?)",
+            (int(time.time()),)
+        )
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            await db.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS alerts_version_{event.lower()} AFTER {event} ON alerts
+                BEGIN
+                    UPDATE alerts_version SET version = version + 1 WHERE id = 1;
+                END
+            """)
+        
         # Create indexes for better performance
-        await db.execute("CREATE INDEX IF NOT EXISTS idx_sensor_device ON sensor_readings(device_id)")
+        # Serves the per-reading trend lookup (device + sensor type + time range, newest first)
+        # and any device_id-only filter through its prefix, so the old device_id index is dropped
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_sensor_device_type_time ON sensor_readings(device_id, sensor_type, timestamp)")
+        await db.execute("DROP INDEX IF EXISTS idx_sensor_device")
         await db.execute("CREATE INDEX IF NOT EXISTS idx_sensor_timestamp ON sensor_readings(timestamp)")
         await db.execute("CREATE INDEX IF NOT EXISTS idx_sensor_type ON sensor_readings(sensor_type)")
         await db.execute("CREATE INDEX IF NOT EXISTS idx_fall_timestamp ON fall_events(timestamp)")
@@ -224,20 +298,21 @@ async def insert_sensor_reading(reading_data: Dict[str, Any]) -> int:
         db = await aiosqlite.connect(DB_PATH)
         try:
             db.row_factory = dict_factory
+            await apply_write_pragmas(db)
             
             # Extract fields
             device_id = reading_data.get("device_id", "unknown")
             sensor_type = reading_data.get("sensor_type", "unknown")
-            timestamp = reading_data.get("timestamp", int(datetime.utcnow().timestamp()))
+            timestamp = reading_data.get("timestamp", int(time.time()))
             location = reading_data.get("location")
             topic = reading_data.get("topic")
             
             # Store data as JSON string
             try:
-                data_json = json.dumps(reading_data.get("data", {}))
+                data_json = dumps_json(reading_data.get("data", {}))
             except Exception as json_error:
                 print(f"⚠️ Error serializing data to JSON: {json_error}")
-                data_json = json.dumps({"error": "failed_to_serialize", "raw": str(reading_data.get("data", {}))})
+                data_json = dumps_json({"error": "failed_to_serialize", "raw": str(reading_data.get("data", {}))})
             
             print(f"   📝 Inserting: device_id={device_id}, sensor_type={sensor_type}, timestamp={timestamp}")
             print(f"   📝 Data JSON length: {len(data_json)} bytes")
@@ -261,14 +336,7 @@ async def insert_sensor_reading(reading_data: Dict[str, Any]) -> int:
                 print(f"   ❌ WARNING: Reading {reading_id} was inserted but not found in database!")
             
             # Update or insert device (device_type should be the device model, not sensor type)
-            # Determine device type from device_id or use default
-            device_type = "esp8266"  # Default for ESP8266 nodes
-            if "ESP8266" in device_id.upper() or "NODE" in device_id.upper():
-                device_type = "esp8266"
-            elif "RASPBERRY" in device_id.upper() or "PI" in device_id.upper():
-                device_type = "raspberry_pi"
-            else:
-                device_type = "sensor_node"  # Generic fallback
+            device_type = _device_type(device_id)
             
             try:
                 # Check if device exists
@@ -338,10 +406,119 @@ async def insert_sensor_reading(reading_data: Dict[str, Any]) -> int:
         print(f"   Database path: {DB_PATH}")
         print(f"   Database exists: {os.path.exists(DB_PATH)}")
         print(f"   Reading data: {reading_data}")
-        import traceback
         traceback.print_exc()
         raise
 
+async def insert_sensor_readings(readings: List[Dict[str, Any]]) -> int:
+    """
+    Insert a batch of sensor readings in a single transaction
+    
+    Device and sensor bookkeeping is applied once per device/sensor in the batch.
+    
+    Args:
+        readings: Reading dicts in the same shape accepted by insert_sensor_reading
+        
+    Returns:
+        Number of readings inserted
+    """
+    if not readings:
+        return 0
+    
+    rows = []
+    device_locations = {}  # device_id -> last non-null location in the batch
+    sensor_updates = {}  # (device_id, sensor_type) -> [reading count, last location]
+    for reading_data in readings:
+        device_id = reading_data.get("device_id", "unknown")
+        sensor_type = reading_data.get("sensor_type", "unknown")
+        timestamp = reading_data.get("timestamp", int(time.time()))
+        location = reading_data.get("location")
+        
+        try:
+            data_json = dumps_json(reading_data.get("data", {}))
+        except Exception as json_error:
+            print(f"⚠️ Error serializing data to JSON: {json_error}")
+            data_json = dumps_json({"error": "failed_to_serialize", "raw": str(reading_data.get("data", {}))})
+        
+        rows.append((device_id, sensor_type, timestamp, data_json, location, reading_data.get("topic")))
+        if location is not None or device_id not in device_locations:
+            device_locations[device_id] = location
+        sensor_update = sensor_updates.setdefault((device_id, sensor_type), [0, None])
+        sensor_update[0] += 1
+        sensor_update[1] = location
+    
+    async with aiosqlite.connect(DB_PATH) as db:
+        db.row_factory = dict_factory
+        await apply_write_pragmas(db)
+        
+        await db.executemany("""
+            INSERT INTO sensor_readings (device_id, sensor_type, timestamp, data, location, topic)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, rows)
+        
+        try:
+            for device_id, location in device_locations.items():
+                cursor = await db.execute("""
+                    UPDATE devices 
+                    SET last_seen = CURRENT_TIMESTAMP,
+                        location = COALESCE(?, location)
+                    WHERE device_id = ?
+                """, (location, device_id))
+                if cursor.rowcount == 0:
+                    await db.execute("""
+                        INSERT INTO devices (device_id, device_type, last_seen, location)
+                        VALUES (?, ?, CURRENT_TIMESTAMP, ?)
+                    """, (device_id, _device_type(device_id), location))
+        except Exception as device_error:
+            print(f"   ⚠️ Warning: Failed to update devices: {device_error}")
+        
+        try:
+            for (device_id, sensor_type), (count, location) in sensor_updates.items():
+                cursor = await db.execute("""
+                    UPDATE sensors 
+                    SET status = 'active', 
+                        last_seen = CURRENT_TIMESTAMP,
+                        total_readings = COALESCE(total_readings, 0) + ?,
+                        location = ?
+                    WHERE device_id = ? AND sensor_type = ?
+                """, (count, location, device_id, sensor_type))
+                if cursor.rowcount == 0:
+                    await db.execute("""
+                        INSERT INTO sensors (device_id, sensor_type, status, last_seen, location, total_readings)
+                        VALUES (?, ?, 'active', CURRENT_TIMESTAMP, ?, ?)
+                    """, (device_id, sensor_type, location, count))
+        except Exception as sensor_error:
+            print(f"   ⚠️ Warning: Failed to update sensors: {sensor_error}")
+        
+        await db.commit()
+    
+    return len(rows)
+
+async def prune_sensor_readings(max_rows: int) -> int:
+    """
+    Delete the oldest sensor readings so that at most max_rows remain
+    
+    Row IDs only grow (AUTOINCREMENT), so the cutoff is a primary key range delete.
+    
+    Returns:
+        Number of readings deleted
+    """
+    async with aiosqlite.connect(DB_PATH) as db:
+        cursor = await db.execute("""
+            DELETE FROM sensor_readings
+            WHERE id <= (SELECT MAX(id) FROM sensor_readings) - ?
+        """, (max_rows,))
+        await db.commit()
+        return cursor.rowcount
+
+def _device_type(device_id: str) -> str:
+    """Determine the device model from its ID"""
+    device_id_upper = device_id.upper()
+    if "ESP8266" in device_id_upper or "NODE" in device_id_upper:
+        return "esp8266"
+    if "RASPBERRY" in device_id_upper or "PI" in device_id_upper:
+        return "raspberry_pi"
+    return "sensor_node"  # Generic fallback
+
 async def insert_fall_event(event_data: Dict[str, Any]) -> int:
     """Insert a fall event into the database"""
     async with aiosqlite.connect(DB_PATH) as db:
@@ -355,7 +532,7 @@ async def insert_fall_event(event_data: Dict[str, Any]) -> int:
         severity_score = event_data.get("severity_score", 0.0)
         verified = 1 if event_data.get("verified", False) else 0
         location = event_data.get("location")
-        sensor_data_json = json.dumps(event_data.get("sensor_data", {}))
+        sensor_data_json = dumps_json(event_data.get("sensor_data", {}))
         
         cursor = await db.execute("""
             INSERT INTO fall_events (user_id, timestamp, severity_score, verified, sensor_data, location)
@@ -378,6 +555,7 @@ async def get_sensor_readings(
             await init_database()
         
         async with aiosqlite.connect(DB_PATH) as db:
+            await apply_read_pragmas(db)
             db.row_factory = dict_factory
             
             query = "SELECT * FROM sensor_readings WHERE 1=1"
@@ -421,7 +599,7 @@ async def get_sensor_readings(
                 if row.get("data"):
                     try:
                         if isinstance(row["data"], str):
-                            row["data"] = json.loads(row["data"])
+                            row["data"] = loads_json(row["data"])
                         elif not isinstance(row["data"], dict):
                             row["data"] = {}
                     except (json.JSONDecodeError, TypeError) as e:
@@ -435,7 +613,6 @@ async def get_sensor_readings(
             return result
     except Exception as e:
         print(f"Error in get_sensor_readings: {e}")
-        import traceback
         traceback.print_exc()
         raise
 
@@ -485,7 +662,7 @@ async def get_fall_events(
             for row in rows:
                 if row.get("sensor_data"):
                     try:
-                        row["sensor_data"] = json.loads(row["sensor_data"])
+                        row["sensor_data"] = loads_json(row["sensor_data"])
                     except (json.JSONDecodeError, TypeError):
                         row["sensor_data"] = {}
                 
@@ -496,7 +673,6 @@ async def get_fall_events(
             return rows
     except Exception as e:
         print(f"Error in get_fall_events: {e}")
-        import traceback
         traceback.print_exc()
         # Return empty list instead of raising to prevent API errors
         return []
@@ -513,7 +689,7 @@ async def get_fall_event(event_id: int) -> Optional[Dict[str, Any]]:
             # Parse JSON sensor_data field
             if row.get("sensor_data"):
                 try:
-                    row["sensor_data"] = json.loads(row["sensor_data"])
+                    row["sensor_data"] = loads_json(row["sensor_data"])
                 except (json.JSONDecodeError, TypeError):
                     row["sensor_data"] = {}
             
@@ -560,14 +736,13 @@ async def get_devices() -> List[Dict[str, Any]]:
             for row in rows:
                 if row.get("metadata"):
                     try:
-                        row["metadata"] = json.loads(row["metadata"])
+                        row["metadata"] = loads_json(row["metadata"])
                     except (json.JSONDecodeError, TypeError):
                         row["metadata"] = {}
             
             return rows
     except Exception as e:
         print(f"Error in get_devices: {e}")
-        import traceback
         traceback.print_exc()
         # Return empty list instead of raising to prevent API errors
         return []
@@ -577,8 +752,7 @@ async def get_recent_room_sensor_data(minutes: int = 5, limit: int = 20) -> List
     async with aiosqlite.connect(DB_PATH) as db:
         db.row_factory = dict_factory
         
-        cutoff_time = datetime.utcnow() - timedelta(minutes=minutes)
-        cutoff_timestamp = int(cutoff_time.timestamp())
+        cutoff_timestamp = int(time.time()) - minutes * 60
         
         cursor = await db.execute("""
             SELECT * FROM sensor_readings
@@ -594,7 +768,7 @@ async def get_recent_room_sensor_data(minutes: int = 5, limit: int = 20) -> List
         for row in rows:
             if row.get("data"):
                 try:
-                    row["data"] = json.loads(row["data"])
+                    row["data"] = loads_json(row["data"])
                 except (json.JSONDecodeError, TypeError):
                     row["data"] = {}
         
@@ -609,6 +783,7 @@ async def count_fall_events(filters: Optional[Dict[str, Any]] = None) -> int:
             await init_database()
         
         async with aiosqlite.connect(DB_PATH) as db:
+            await apply_read_pragmas(db)
             db.row_factory = dict_factory
             
             query = "SELECT COUNT(*) as count FROM fall_events WHERE 1=1"
@@ -644,6 +819,7 @@ async def count_sensor_readings() -> int:
             await init_database()
         
         async with aiosqlite.connect(DB_PATH) as db:
+            await apply_read_pragmas(db)
             db.row_factory = dict_factory
             
             try:
@@ -667,6 +843,7 @@ async def count_active_devices() -> int:
             await init_database()
         
         async with aiosqlite.connect(DB_PATH) as db:
+            await apply_read_pragmas(db)
             db.row_factory = dict_factory
             
             cutoff_time = datetime.utcnow() - timedelta(hours=24)
@@ -689,18 +866,59 @@ async def count_active_devices() -> int:
         return 0
 
 async def insert_alert_log(event_id: int, channels: List[str], status: str):
-    """Insert an alert log entry"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = dict_factory
-        
-        channels_json = json.dumps(channels)
-        
-        await db.execute("""
-            INSERT INTO alert_logs (event_id, channels, status)
-            VALUES (?, ?, ?)
-        """, (event_id, channels_json, status))
+    """Queue an alert log entry; a background task writes queued entries in batches"""
+    global _alert_log_queue, _alert_log_writer
+    if _alert_log_queue is None:
+        _alert_log_queue = asyncio.Queue()
+    if _alert_log_writer is None or _alert_log_writer.done():
+        _alert_log_writer = asyncio.create_task(_write_alert_logs(_alert_log_queue))
+    
+    _alert_log_queue.put_nowait((event_id, dumps_json(channels), status))
+
+async def close_alert_log():
+    """Write any queued alert log entries and stop the background writer (application shutdown)"""
+    global _alert_log_writer
+    if _alert_log_writer is None or _alert_log_writer.done():
+        return
+    
+    _alert_log_queue.put_nowait(None)
+    await _alert_log_writer
+    _alert_log_writer = None
+
+async def _write_alert_logs(queue: asyncio.Queue):
+    """Write queued alert log rows with executemany, up to ALERT_LOG_BATCH_SIZE per commit, until a None sentinel"""
+    loop = asyncio.get_running_loop()
+    running = True
+    while running:
+        row = await queue.get()
+        if row is None:
+            break
+        batch = [row]
+        
+        deadline = loop.time() + ALERT_LOG_FLUSH_INTERVAL
+        while len(batch) < ALERT_LOG_BATCH_SIZE:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                row = await asyncio.wait_for(queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if row is None:
+                running = False
+                break
+            batch.append(row)
         
-        await db.commit()
+        try:
+            async with aiosqlite.connect(DB_PATH) as db:
+                await apply_write_pragmas(db)
+                await db.executemany("""
+                    INSERT INTO alert_logs (event_id, channels, status)
+                    VALUES (?, ?, ?)
+                """, batch)
+                await db.commit()
+        except Exception as e:
+            print(f"Error writing {len(batch)} alert log entries: {e}")
 
 async def get_sensors(sensor_type: Optional[str] = None, device_id: Optional[str] = None) -> List[Dict[str, Any]]:
     """Get all sensors with their status
@@ -760,7 +978,6 @@ async def get_sensors(sensor_type: Optional[str] = None, device_id: Optional[str
             return rows
     except Exception as e:
         print(f"Error in get_sensors: {e}")
-        import traceback
         traceback.print_exc()
         return []
 
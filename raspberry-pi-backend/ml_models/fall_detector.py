@@ -32,10 +32,20 @@ class FallDetector:
         self,
         wearable_data: Dict,
         room_sensor_data: List[Dict]
+    ) -> Dict:
+        """Detect fall using multi-sensor fusion (see detect_fall_sync)"""
+        return self.detect_fall_sync(wearable_data, room_sensor_data)
+    
+    def detect_fall_sync(
+        self,
+        wearable_data: Dict,
+        room_sensor_data: List[Dict]
     ) -> Dict:
         """
         Detect fall using multi-sensor fusion
         
+        Synchronous so callers can run it in an executor, off the event loop.
+        
         Args:
             wearable_data: Accelerometer data from Micro:bit
             room_sensor_data: Recent room sensor readings
@@ -4,10 +4,18 @@ Uses trained ML models to predict alerts from sensor data
 """
 
 import numpy as np
+from collections import OrderedDict
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 from ml_models.model_loader import ModelLoader
 
+# Shared default for readings without a data payload (never mutated)
+_EMPTY: Dict[str, Any] = {}
+
+# Every feature row starts with the raw reading (temperature/humidity, or motion/distance);
+# only these columns are quantized in the prediction cache key
+_QUANTIZED_FEATURES = 2
+
 # Use string literals to avoid circular import
 # Alert types and severities are defined in alerts.alert_engine
 # but we use string values here to avoid circular dependency
@@ -25,6 +33,11 @@ class MLAlertPredictor:
         self.model_loader = ModelLoader(models_dir)
         self.models_loaded = False
         
+        # Recent model outputs keyed by feature vectors with the raw reading quantized,
+        # so consecutive near-identical readings over the same history skip the forward pass
+        self.prediction_cache_size = 512
+        self._prediction_cache: "OrderedDict[Tuple, Tuple[Any, Optional[float]]]" = OrderedDict()
+        
     def load_models(self):
         """Load all available ML models"""
         if self.models_loaded:
@@ -84,19 +97,8 @@ class MLAlertPredictor:
             return None
         
         try:
-            # Load scaler if available
-            scaler = self.model_loader.get_model("temperature_anomaly_scaler.pkl")
-            if scaler:
-                features = scaler.transform(features)
-            
             # Predict using ML model
-            prediction = model.predict(features)[0]
-            probability = None
-            
-            # Get prediction probability if available
-            if hasattr(model, 'predict_proba'):
-                proba = model.predict_proba(features)[0]
-                probability = float(max(proba))
+            prediction, probability = self._predict(model, "temperature_anomaly.pkl", features)
             
             # If anomaly detected (prediction == 1 or probability > threshold)
             is_anomaly = prediction == 1 or (probability and probability > 0.7)
@@ -165,18 +167,8 @@ class MLAlertPredictor:
             return None
         
         try:
-            # Load scaler if available
-            scaler = self.model_loader.get_model("fire_risk_model_scaler.pkl")
-            if scaler:
-                features = scaler.transform(features)
-            
             # Predict fire risk
-            prediction = model.predict(features)[0]
-            probability = None
-            
-            if hasattr(model, 'predict_proba'):
-                proba = model.predict_proba(features)[0]
-                probability = float(max(proba))
+            prediction, probability = self._predict(model, "fire_risk_model.pkl", features)
             
             # Fire risk detected
             is_fire_risk = prediction == 1 or (probability and probability > 0.6)
@@ -251,17 +243,7 @@ class MLAlertPredictor:
             return None
         
         try:
-            # Load scaler if available
-            scaler = self.model_loader.get_model("motion_anomaly_scaler.pkl")
-            if scaler:
-                features = scaler.transform(features)
-            
-            prediction = model.predict(features)[0]
-            probability = None
-            
-            if hasattr(model, 'predict_proba'):
-                proba = model.predict_proba(features)[0]
-                probability = float(max(proba))
+            prediction, probability = self._predict(model, "motion_anomaly.pkl", features)
             
             is_anomaly = prediction == 1 or (probability and probability > 0.7)
             
@@ -283,6 +265,50 @@ class MLAlertPredictor:
         
         return None
     
+    def _predict(self, model, model_name: str, features: np.ndarray) -> Tuple[Any, Optional[float]]:
+        """
+        Run a model on a single feature row, reusing cached output for near-identical inputs
+        
+        Args:
+            model: Loaded model
+            model_name: Model file name, also used to find its scaler
+            features: Unscaled feature row (1 x n)
+            
+        Returns:
+            Tuple of (prediction, probability or None)
+        """
+        # Quantize only the raw reading in the first two columns to 0.5 steps (0.5°C, 0.5% RH);
+        # derived trend/std features stay exact so a slow rise never reuses a flat series' output
+        row = features[0]
+        key = (
+            (model_name,)
+            + tuple(round(float(x) * 2) for x in row[:_QUANTIZED_FEATURES])
+            + tuple(float(x) for x in row[_QUANTIZED_FEATURES:])
+        )
+        cached = self._prediction_cache.get(key)
+        if cached is not None:
+            self._prediction_cache.move_to_end(key)
+            return cached
+        
+        # Load scaler if available
+        scaler = self.model_loader.get_model(model_name.replace(".pkl", "_scaler.pkl"))
+        if scaler:
+            features = scaler.transform(features)
+        
+        prediction = model.predict(features)[0]
+        probability = None
+        
+        # Get prediction probability if available
+        if hasattr(model, 'predict_proba'):
+            proba = model.predict_proba(features)[0]
+            probability = float(max(proba))
+        
+        self._prediction_cache[key] = (prediction, probability)
+        if len(self._prediction_cache) > self.prediction_cache_size:
+            self._prediction_cache.popitem(last=False)
+        
+        return prediction, probability
+    
     def _extract_temperature_features(
         self,
         temperature: float,
@@ -296,10 +322,10 @@ class MLAlertPredictor:
             return np.array([[temperature, humidity, temperature, 1.0, 0.0, humidity, 5.0]])
         
         # Extract temperature and humidity history
-        temps = [r.get("data", {}).get("temperature_c") for r in recent_readings[-10:] 
-                if r.get("data", {}).get("temperature_c") is not None]
-        hums = [r.get("data", {}).get("humidity_percent") for r in recent_readings[-10:]
-                if r.get("data", {}).get("humidity_percent") is not None]
+        temps = [t for r in recent_readings[-10:]
+                if (t := r.get("data", _EMPTY).get("temperature_c")) is not None]
+        hums = [h for r in recent_readings[-10:]
+                if (h := r.get("data", _EMPTY).get("humidity_percent")) is not None]
         
         if not temps:
             temps = [temperature]
@@ -338,10 +364,10 @@ class MLAlertPredictor:
             return np.array([[temperature, humidity, 0, 0]])  # No trend data
         
         # Get recent temperatures
-        temps = [r.get("data", {}).get("temperature_c") for r in recent_readings[-5:]
-                if r.get("data", {}).get("temperature_c") is not None]
-        hums = [r.get("data", {}).get("humidity_percent") for r in recent_readings[-5:]
-                if r.get("data", {}).get("humidity_percent") is not None]
+        temps = [t for r in recent_readings[-5:]
+                if (t := r.get("data", _EMPTY).get("temperature_c")) is not None]
+        hums = [h for r in recent_readings[-5:]
+                if (h := r.get("data", _EMPTY).get("humidity_percent")) is not None]
         
         if not temps:
             return np.array([[temperature, humidity, 0, 0]])
@@ -368,11 +394,11 @@ class MLAlertPredictor:
         
         # Count motion events in recent readings
         motion_count = sum(1 for r in recent_readings[-10:]
-                          if r.get("data", {}).get("motion_detected", False))
+                          if r.get("data", _EMPTY).get("motion_detected", False))
         
         # Average distance
-        distances = [r.get("data", {}).get("distance_cm") for r in recent_readings[-10:]
-                    if r.get("data", {}).get("distance_cm") is not None]
+        distances = [d for r in recent_readings[-10:]
+                    if (d := r.get("data", _EMPTY).get("distance_cm")) is not None]
         avg_distance = np.mean(distances) if distances else distance_val
         
         return np.array([[motion_binary, distance_val, motion_count, avg_distance]])
@@ -387,8 +413,8 @@ class MLAlertPredictor:
         if recent_readings is None or len(recent_readings) < 5:
             return None
         
-        temps = [r.get("data", {}).get("temperature_c") for r in recent_readings[-20:]
-                if r.get("data", {}).get("temperature_c") is not None]
+        temps = [t for r in recent_readings[-20:]
+                if (t := r.get("data", _EMPTY).get("temperature_c")) is not None]
         
         if len(temps) < 5:
             return None
@@ -462,7 +488,7 @@ class MLAlertPredictor:
         motion_readings = [
             r for r in recent_readings[-20:]
             if r.get("sensor_type") == "pir"
-            and r.get("data", {}).get("motion_detected", False)
+            and r.get("data", _EMPTY).get("motion_detected", False)
         ]
         
         return len(motion_readings) > 0
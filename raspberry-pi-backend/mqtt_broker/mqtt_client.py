@@ -6,13 +6,21 @@ Handles MQTT broker connection and message processing
 import paho.mqtt.client as mqtt
 import json
 import asyncio
+import logging
 import time
 from typing import Callable, Optional
 import os
 from dotenv import load_dotenv
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 load_dotenv()
 
+# Per-message logging; detail is only formatted when DEBUG is enabled
+logger = logging.getLogger(__name__)
+
 class MQTTClient:
     """Async MQTT client wrapper"""
     
@@ -106,33 +114,26 @@ class MQTTClient:
             topic = msg.topic
             payload_str = msg.payload.decode('utf-8')
             
-            # Enhanced logging for DHT22 messages
-            if "dht22" in topic.lower():
-                print(f"🌡️ DHT22 MQTT message received on topic: {topic}")
-                print(f"   Full payload: {payload_str}")
-                # Try to parse as JSON and check for temperature/humidity
-                try:
-                    temp_payload = json.loads(payload_str)
-                    if isinstance(temp_payload, dict):
-                        temp = temp_payload.get("temperature_c")
-                        hum = temp_payload.get("humidity_percent")
-                        if temp is not None or hum is not None:
-                            print(f"   ✓ DHT22 data found: temp={temp}°C, humidity={hum}%")
-                        else:
-                            print(f"   ⚠️ DHT22 payload missing temperature_c or humidity_percent")
-                            print(f"   Payload keys: {list(temp_payload.keys())}")
-                except:
-                    print(f"   ⚠️ DHT22 payload is not valid JSON")
-            else:
-                print(f"📨 Received MQTT message on topic: {topic}")
-                print(f"   Payload: {payload_str[:100]}...")  # Print first 100 chars
-            
-            # Try to parse as JSON
+            # Parse once (orjson reads the raw bytes); the DHT22 logging below reuses the result
             try:
-                payload = json.loads(payload_str)
+                payload = orjson.loads(msg.payload) if orjson is not None else json.loads(payload_str)
+                is_json = True
             except json.JSONDecodeError:
                 # If not JSON, create simple dict
                 payload = {"value": payload_str, "raw": payload_str}
+                is_json = False
+            
+            # Enhanced logging for DHT22 messages
+            if "dht22" in topic.lower():
+                logger.debug("🌡️ DHT22 MQTT message received on topic %s: %s", topic, payload_str)
+                # Check the parsed JSON for temperature/humidity
+                if not is_json:
+                    logger.warning("⚠️ DHT22 payload on %s is not valid JSON", topic)
+                elif isinstance(payload, dict):
+                    if payload.get("temperature_c") is None and payload.get("humidity_percent") is None:
+                        logger.warning("⚠️ DHT22 payload on %s missing temperature_c or humidity_percent, keys: %s", topic, list(payload))
+            else:
+                logger.debug("📨 Received MQTT message on topic %s: %.100s", topic, payload_str)
             
             # Ensure payload is a dictionary (JSON can parse to primitives like int, float, str)
             if not isinstance(payload, dict):
@@ -154,7 +155,6 @@ class MQTTClient:
             # Call message handler if set
             if self.message_handler and self.event_loop:
                 try:
-                    print(f"🔄 Scheduling message handler for topic: {topic}")
                     # Use run_coroutine_threadsafe to safely schedule in the main event loop
                     # Don't wait for result here - let it run asynchronously
                     # The handler will log its own success/failure
@@ -162,27 +162,22 @@ class MQTTClient:
                         self.message_handler(topic, payload),
                         self.event_loop
                     )
-                    # Add a callback to log completion (optional, for debugging)
+                    # Add a callback to log failures
                     def log_completion(fut):
                         try:
                             fut.result()  # This will raise if there was an exception
-                            print(f"✅ Message handler completed for topic: {topic}")
-                        except Exception as e:
-                            print(f"❌ Message handler failed for topic {topic}: {e}")
-                            import traceback
-                            traceback.print_exc()
+                        except Exception:
+                            logger.exception("❌ Message handler failed for topic %s", topic)
                     future.add_done_callback(log_completion)
-                except Exception as e:
-                    print(f"❌ Error scheduling message handler: {e}")
-                    import traceback
-                    traceback.print_exc()
+                except Exception:
+                    logger.exception("❌ Error scheduling message handler")
             elif self.message_handler:
-                print("⚠️ Warning: Event loop not available, cannot process message")
+                logger.warning("⚠️ Event loop not available, cannot process message")
             else:
-                print("⚠️ Warning: No message handler set, message will not be processed")
+                logger.warning("⚠️ No message handler set, message will not be processed")
             
         except Exception as e:
-            print(f"Error processing MQTT message: {e}")
+            logger.error("Error processing MQTT message: %s", e)
     
     def _on_disconnect(self, client, userdata, rc):
         """Callback when disconnected"""
@@ -18,6 +18,7 @@ if (Test-Path "..\venv\Scripts\Activate.ps1") {
 # Set environment variables
 $env:API_HOST = "0.0.0.0"
 $env:API_PORT = "8000"
+$env:API_RELOAD = "true"
 
 Write-Host "Starting server on http://0.0.0.0:8000" -ForegroundColor Cyan
 Write-Host "API will be accessible at:" -ForegroundColor Cyan
@@ -19,6 +19,7 @@ fi
 # Set environment variables
 export API_HOST=0.0.0.0
 export API_PORT=8000
+export API_RELOAD=true
 
 echo "Starting server on http://0.0.0.0:8000"
 echo "API will be accessible at:"